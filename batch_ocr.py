@@ -0,0 +1,199 @@
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from instrumentation import accumulate, to_prometheus
+from ocr_cache import preprocess_cache
+from ocr_engine import get_engine_pool
+from ocr_pipeline import ocr_pages
+from thresholding import THRESHOLD_MODES
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".pdf")
+
+
+# Function to expand directories, globs and plain paths into image files
+def find_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        paths.append(os.path.join(root, name))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            paths.extend(p for p in glob.glob(item, recursive=True)
+                         if p.lower().endswith(IMAGE_EXTENSIONS))
+
+    # Keep a stable order and drop duplicates
+    return sorted(set(paths))
+
+
+# Function to read the paths whose pages were all written to the output file
+def load_checkpoint(output_path):
+    if not os.path.exists(output_path):
+        return set()
+
+    # Runs append to the file, so a path's last outcome is the one that counts
+    state = {}
+
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partial line from an interrupted run, redo that page
+                continue
+            path = record["path"]
+            state[path] = "failed" if record.get("error") else "done" if record.get("last_page") else state.get(path)
+    return {path for path, outcome in state.items() if outcome == "done"}
+
+
+# Function to set up each worker process
+def _init_worker(engines=1, profile_memory=False):
+    # Each worker keeps its own engines per language, and pages are not
+    # revisited within a batch so the preprocessing cache only costs memory
+    get_engine_pool(size=engines)
+    preprocess_cache.max_bytes = 0
+
+    # Per-stage peak memory is only recorded while tracemalloc is tracing
+    if profile_memory:
+        tracemalloc.start()
+
+
+# Function to OCR every page of a single file inside a worker process
+def ocr_file(path, lang, mode="fixed", tiled=False, adaptive=False, skip_empty=True, skip_diagrams=False,
+             near_duplicates=False):
+    base = {"path": path, "lang": lang, "threshold_mode": mode, "text": None, "error": None}
+    records = []
+    start = time.perf_counter()
+    try:
+        for result in ocr_pages(path, lang=lang, mode=mode, tiled=tiled, adaptive=adaptive,
+                                 skip_empty=skip_empty, skip_diagrams=skip_diagrams,
+                                 near_duplicates=near_duplicates):
+            record = dict(base, **result)
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            records.append(record)
+            start = time.perf_counter()
+    except Exception as e:
+        records.append(dict(base, error=str(e), seconds=round(time.perf_counter() - start, 4)))
+    if not records:
+        records.append(dict(base, error="no pages", seconds=round(time.perf_counter() - start, 4)))
+
+    # Only a file whose last page made it to disk counts as finished on resume
+    records[-1]["last_page"] = True
+    return records
+
+
+# Function to pick a value at the given percentile using nearest rank
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+# Function to summarize throughput and latency of a batch run
+def summarize(latencies, errors, elapsed, skipped=0):
+    pages = len(latencies)
+    return {
+        "pages": pages,
+        "errors": errors,
+        "skipped": skipped,
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 3) if elapsed > 0 else 0.0,
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+    }
+
+
+def run_batch(inputs, output_path, lang="eng", workers=None, resume=True, mode="fixed", tiled=False,
+              metrics_path=None, profile_memory=False, adaptive=False, skip_empty=True, skip_diagrams=False,
+              near_duplicates=False):
+    paths = find_images(inputs)
+    if resume:
+        done = load_checkpoint(output_path)
+        paths = [p for p in paths if p not in done]
+
+    latencies = []
+    errors = 0
+    skipped = 0
+    stages = {}
+    start = time.perf_counter()
+
+    # Tiled pages share the cores between worker processes and their block threads
+    workers = workers or os.cpu_count()
+    engines = max(1, (os.cpu_count() or 1) // workers) if tiled else 1
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(engines, profile_memory)) as pool:
+        futures = [pool.submit(ocr_file, path, lang, mode, tiled, adaptive, skip_empty, skip_diagrams,
+                               near_duplicates) for path in paths]
+        for future in as_completed(futures):
+            for record in future.result():
+                if record["error"]:
+                    errors += 1
+                if record.get("skipped"):
+                    skipped += 1
+                accumulate(stages, record.get("stages", {}))
+                latencies.append(record["seconds"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            # Flush every file so an interrupted run can resume from here
+            out.flush()
+
+    # Stage totals for a Prometheus textfile collector or a pushgateway
+    if metrics_path:
+        with open(metrics_path, "w", encoding="utf-8") as f:
+            f.write(to_prometheus(stages))
+
+    return summarize(latencies, errors, time.perf_counter() - start, skipped)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR a directory or glob of images and PDFs into JSON lines, one per page")
+    parser.add_argument("inputs", nargs="+", help="image or PDF files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="ocr_results.jsonl", help="JSON lines file to write")
+    parser.add_argument("-l", "--lang", default="eng", help="tesseract language, e.g. eng, hin, mar, or auto to detect the script per page")
+    parser.add_argument("-t", "--threshold-mode", choices=THRESHOLD_MODES, default="fixed",
+                        help="binarization: fixed 140 cut-off, global Otsu or local Sauvola")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--tiled", action="store_true",
+                        help="split each page into text blocks and OCR them in parallel threads")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="re-recognize low confidence lines with heavier preprocessing")
+    parser.add_argument("--keep-empty", action="store_true",
+                        help="recognize blank and textless pages instead of skipping them")
+    parser.add_argument("--skip-diagrams", action="store_true",
+                        help="blank out dense line art before recognition")
+    parser.add_argument("--near-duplicates", action="store_true",
+                        help="also reuse stored text for pages whose perceptual hash is close; only for re-scans "
+                             "of the same pages, since filled-in copies of one form hash alike")
+    parser.add_argument("--metrics", default=None,
+                        help="write per-stage time and memory totals to this file in Prometheus text format")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="record each stage's peak memory with tracemalloc (slower)")
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of skipping finished pages")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.inputs, args.output, lang=args.lang,
+                        workers=args.workers, resume=not args.no_resume,
+                        mode=args.threshold_mode, tiled=args.tiled,
+                        metrics_path=args.metrics, profile_memory=args.profile_memory,
+                        adaptive=args.adaptive, skip_empty=not args.keep_empty,
+                        skip_diagrams=args.skip_diagrams, near_duplicates=args.near_duplicates)
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from batch_ocr import percentile
+from bench_preprocess import SAMPLE_IMAGES
+from image_io import open_gray
+from ocr_cache import preprocess_cache
+from ocr_engine import get_engine_pool
+from ocr_pipeline import enhance_image, recognize_page
+from scaling import load_scaled_gray
+
+# Hand-checked transcripts of sample images, for the character error rate. op.txt is an
+# early OCR run of the fee receipt, errors included, and is no reference
+GOLDEN_TRANSCRIPTS = {
+    "Adobe Scan 29 Mar 2024_page-0001.jpg": "golden/fee_receipt.txt",
+}
+
+DEFAULT_BASELINE = "bench_baseline.json"
+
+
+# Function to run the original full-resolution PIL chain of the standalone scripts
+def legacy_ocr(path, lang="eng"):
+    img = enhance_image(open_gray(path))
+    img = img.point(lambda x: 0 if x < 140 else 255)
+    return get_engine_pool().image_to_string(img, lang=lang)
+
+
+# Function to build a run of the current pipeline, bypassing the result store
+def pipeline_ocr(mode="fixed", tiled=False, lang="eng", adaptive=False):
+    def run(path):
+        gray, _ = load_scaled_gray(path)
+        return recognize_page(gray, lang=lang, mode=mode, rescale=False, tiled=tiled,
+                              adaptive=adaptive)["text"]
+    return run
+
+
+# Pipeline configurations to compare, by name
+CONFIGS = {
+    "legacy": legacy_ocr,
+    "fixed": pipeline_ocr("fixed"),
+    "otsu": pipeline_ocr("otsu"),
+    "sauvola": pipeline_ocr("sauvola"),
+    "sauvola-tiled": pipeline_ocr("sauvola", tiled=True),
+    "auto": pipeline_ocr("sauvola", lang="auto"),
+    "adaptive": pipeline_ocr("fixed", adaptive=True),
+}
+
+
+# Function to count the single character edits turning one string into another
+def edit_distance(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+# Function to compute the character error rate of a transcript, ignoring layout whitespace
+def character_error_rate(text, reference):
+    text, reference = " ".join(text.split()), " ".join(reference.split())
+    if not reference:
+        return 0.0 if not text else 1.0
+    return edit_distance(text, reference) / len(reference)
+
+
+# Function to time one configuration on one image and measure its accuracy and memory
+def run_one(config, path, repeat=1):
+    run = CONFIGS[config]
+    record = {"config": config, "image": os.path.basename(path), "seconds": None,
+              "peak_bytes": None, "cer": None, "error": None}
+    try:
+        # Best of several cold runs; the preprocessing cache would hide repeats
+        best = float("inf")
+        for _ in range(repeat):
+            preprocess_cache.clear()
+            start = time.perf_counter()
+            text = run(path)
+            best = min(best, time.perf_counter() - start)
+        record["seconds"] = round(best, 4)
+
+        # A separate traced run, since tracemalloc slows the timed ones down
+        preprocess_cache.clear()
+        tracemalloc.start()
+        try:
+            run(path)
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except Exception as e:
+        record["error"] = str(e)
+        return record
+
+    golden = GOLDEN_TRANSCRIPTS.get(os.path.basename(path))
+    if golden and os.path.exists(golden):
+        with open(golden, encoding="utf-8") as f:
+            record["cer"] = round(character_error_rate(text, f.read()), 4)
+    return record
+
+
+# Function to summarize latency, throughput, memory and accuracy per configuration
+def summarize(records):
+    summary = {}
+    for config in dict.fromkeys(r["config"] for r in records):
+        ok = [r for r in records if r["config"] == config and not r["error"]]
+        seconds = [r["seconds"] for r in ok]
+        cers = [r["cer"] for r in ok if r["cer"] is not None]
+        total = sum(seconds)
+        summary[config] = {
+            "images": len(ok),
+            "errors": sum(1 for r in records if r["config"] == config and r["error"]),
+            "total_seconds": round(total, 4),
+            "images_per_second": round(len(ok) / total, 3) if total > 0 else 0.0,
+            "p50_seconds": round(percentile(seconds, 50), 4),
+            "p95_seconds": round(percentile(seconds, 95), 4),
+            "peak_bytes": max((r["peak_bytes"] for r in ok), default=0),
+            "mean_cer": round(sum(cers) / len(cers), 4) if cers else None,
+        }
+    return summary
+
+
+# Function to list the measurements that got worse than the stored baseline
+def find_regressions(records, baseline, latency_tolerance=0.25, min_seconds=0.05, cer_tolerance=0.01):
+    previous = {(r["config"], r["image"]): r for r in baseline.get("records", [])}
+    regressions = []
+    for record in records:
+        old = previous.get((record["config"], record["image"]))
+        if old is None:
+            continue
+        if record["error"] and not old.get("error"):
+            regressions.append(f"{record['config']} {record['image']}: now fails: {record['error']}")
+            continue
+        if record["error"] or old.get("error"):
+            continue
+
+        # Small absolute changes are timer noise, however large relative to a fast image
+        slower = record["seconds"] - old["seconds"]
+        if slower > min_seconds and record["seconds"] > old["seconds"] * (1 + latency_tolerance):
+            regressions.append(f"{record['config']} {record['image']}: "
+                               f"{old['seconds']:.3f}s -> {record['seconds']:.3f}s")
+        if record["cer"] is not None and old.get("cer") is not None \
+                and record["cer"] > old["cer"] + cer_tolerance:
+            regressions.append(f"{record['config']} {record['image']}: "
+                               f"CER {old['cer']:.4f} -> {record['cer']:.4f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OCR pipeline configurations over the sample images")
+    parser.add_argument("images", nargs="*", default=SAMPLE_IMAGES)
+    parser.add_argument("-c", "--config", action="append", choices=list(CONFIGS),
+                        help="configuration to run, may be repeated (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="timed runs per image, best is kept")
+    parser.add_argument("-o", "--output", default=None, help="write the full report to this JSON file")
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE, help="baseline report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="fail when there is no baseline to compare against, e.g. in CI")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument("--cer-tolerance", type=float, default=0.01,
+                        help="absolute rise in character error rate that counts as a regression")
+    args = parser.parse_args(argv)
+
+    # Without a baseline nothing can be flagged, which must not pass for a clean run
+    if not os.path.exists(args.baseline) and not args.save_baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one", file=sys.stderr)
+        if args.require_baseline:
+            return 2
+
+    records = []
+    print(f"{'config':14} {'image':40} {'seconds':>8} {'peak MB':>8} {'CER':>7}")
+    for config in args.config or list(CONFIGS):
+        for path in args.images:
+            record = run_one(config, path, args.repeat)
+            records.append(record)
+            if record["error"]:
+                print(f"{config:14} {record['image'][:40]:40} error: {record['error']}")
+                continue
+            cer = f"{record['cer']:.4f}" if record["cer"] is not None else "-"
+            print(f"{config:14} {record['image'][:40]:40} {record['seconds']:>8.3f} "
+                  f"{record['peak_bytes'] / (1024 * 1024):>8.1f} {cer:>7}")
+
+    report = {"records": records, "summary": summarize(records)}
+    print(json.dumps(report["summary"], indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(records, json.load(f), args.latency_tolerance,
+                                           cer_tolerance=args.cer_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+
+    if args.save_baseline:
+        # A run where nothing could be recognized, e.g. without tesseract, is no baseline
+        if all(record["error"] for record in records):
+            print("Every run failed; baseline not saved", file=sys.stderr)
+            return 1
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
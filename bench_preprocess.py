@@ -0,0 +1,67 @@
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from image_io import decode_image, to_gray
+from ocr_pipeline import enhance_image, fused_preprocess
+
+SAMPLE_IMAGES = [
+    "1.jpg",
+    "Adobe Scan 29 Mar 2024_page-0001.jpg",
+    "Adobe Scan 29 Mar 2024_page-0002.jpg",
+    "Rahul_kumar.jpg",
+    "handwritten-text-1.jpg",
+    "hindi.png",
+    "hindi_img_2.png",
+    "img.jpeg_page-0001.jpg",
+    "img2.png",
+    "marathi.jpg",
+    "shashikant_page-0001.jpg",
+    "tree_page-0001.jpg",
+]
+
+
+# Function to run the original PIL contrast -> sharpness -> point chain
+def pil_preprocess(gray, contrast=1.5, sharpness=2.0, threshold=140):
+    img = enhance_image(Image.fromarray(gray), contrast, sharpness)
+    return np.asarray(img.point(lambda x: 0 if x < threshold else 255))
+
+
+# Function to time the best of several runs of a preprocessing function
+def best_time(func, gray, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(gray)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the PIL and fused preprocessing chains")
+    parser.add_argument("images", nargs="*", default=SAMPLE_IMAGES)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    total_pil = total_fused = 0.0
+    print(f"{'image':40} {'pixels':>10} {'pil ms':>8} {'fused ms':>9} {'speedup':>8} {'diff %':>7}")
+    for path in args.images:
+        gray = to_gray(decode_image(path))
+        pil_seconds, expected = best_time(pil_preprocess, gray, args.repeat)
+        fused_seconds, actual = best_time(fused_preprocess, gray, args.repeat)
+        total_pil += pil_seconds
+        total_fused += fused_seconds
+
+        # Fraction of pixels where the two chains disagree
+        diff = np.count_nonzero(expected != actual) / expected.size * 100
+        print(f"{path[:40]:40} {gray.size:>10} {pil_seconds * 1000:>8.1f} {fused_seconds * 1000:>9.1f} "
+              f"{pil_seconds / fused_seconds:>7.2f}x {diff:>7.3f}")
+
+    print(f"{'total':40} {'':>10} {total_pil * 1000:>8.1f} {total_fused * 1000:>9.1f} "
+          f"{total_pil / total_fused:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import csv
+import io
+import json
+
+
+# Function to encode recognized text for download
+def text_bytes(text):
+    return text.encode("utf-8")
+
+
+# Function to encode an OCR result, with any line, block or word boxes, as JSON
+def json_bytes(result):
+    return json.dumps(result, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+# Function to encode table rows as CSV
+def csv_bytes(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    # A byte order mark lets spreadsheet apps detect UTF-8 Devanagari
+    return buffer.getvalue().encode("utf-8-sig")
@@ -1,47 +1,17 @@
 import streamlit as st
-from PIL import Image, ImageEnhance
-import pytesseract
 
-@st.cache_data
-def enhance_image(img):
-    # Increase contrast
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(1.5)
-
-    # Increase sharpness
-    enhancer = ImageEnhance.Sharpness(img)
-    img = enhancer.enhance(2.0)
-
-    return img
-
-@st.cache_data
-def preprocess_image(_img):
-    # Convert image to grayscale
-    img = _img.convert('L')
-
-    # Enhance image quality
-    img = enhance_image(img)
-
-    # Apply thresholding to binarize the image
-    img = img.point(lambda x: 0 if x < 140 else 255)
-
-    return img
+from ocr_pipeline import ocr_page
 
 def detect_handwritten_text(image):
     try:
-        # Open the image
-        img = Image.open(image)
-
-        # Preprocess the entire image
-        img = preprocess_image(img)
-
-        # Display the uploaded image
-        st.image(img, caption="Preprocessed Image", use_column_width=True)
+        # Recognize through the result store with the Hindi language model
+        result = ocr_page(image, lang='hin', keep_image=True)
 
-        # Use pytesseract to perform OCR with Hindi language model
-        text = pytesseract.image_to_string(img, lang='hin')
+        # Display the page as it was recognized
+        if result.get("image") is not None:
+            st.image(result["image"], caption="Preprocessed Image", use_column_width=True)
 
-        return text
+        return result["text"]
 
     except Exception as e:
         st.error(f"Error: {e}")
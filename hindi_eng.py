@@ -1,54 +1,23 @@
 import streamlit as st
-from PIL import Image, ImageEnhance
-import pytesseract
-import base64  # Import base64 module
-import os
 
-@st.cache_data
-def enhance_image(img):
-    # Increase contrast
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(1.5)
-
-    # Increase sharpness
-    enhancer = ImageEnhance.Sharpness(img)
-    img = enhancer.enhance(2.0)
-
-    return img
-
-@st.cache_data
-def preprocess_image(_img):
-    # Convert image to grayscale
-    img = _img.convert('L')
-
-    # Enhance image quality
-    img = enhance_image(img)
-
-    # Apply thresholding to binarize the image
-    img = img.point(lambda x: 0 if x < 140 else 255)
-
-    return img
+from ocr_pipeline import ocr_page
 
 def detect_handwritten_text(image):
     try:
-        # Open the image
-        img = Image.open(image)
-
-        # Preprocess the entire image
-        img = preprocess_image(img)
+        # Recognize through the result store; 'auto' detects the script so only one language model has to run
+        result = ocr_page(image, lang='auto', keep_image=True)
 
-        # Display the uploaded image
-        st.image(img, caption="Preprocessed Image", use_column_width=True)
+        # Display the page as it was recognized
+        if result.get("image") is not None:
+            st.image(result["image"], caption="Preprocessed Image", use_column_width=True)
 
-        # Use pytesseract to perform OCR with English language model
-        text_eng = pytesseract.image_to_string(img, lang='eng')
-        st.subheader("Detected Handwritten English Text:")
-        st.text_area("Text (English)", text_eng, height=200)
+        language = result["lang"]
+        if result.get("script"):
+            decision = result["script"]
+            st.caption(f"Detected script: {decision['script']} ({language}) in {decision['seconds'] * 1000:.1f} ms")
 
-        # Use pytesseract to perform OCR with Hindi language model
-        text_hin = pytesseract.image_to_string(img, lang='hin')
-        st.subheader("Detected Handwritten Hindi Text:")
-        st.text_area("Text (Hindi)", text_hin, height=200)
+        st.subheader(f"Detected Handwritten Text ({language}):")
+        st.text_area(f"Text ({language})", result["text"], height=200)
 
     except Exception as e:
         st.error(f"Error: {e}")
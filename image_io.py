@@ -0,0 +1,125 @@
+import math
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# pypdfium2 renders PDF pages without poppler; PDFs are rejected without it
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Resolution PDF pages are rendered at before OCR
+PDF_DPI = 300
+
+
+# Function to decode an image file once into a uint8 pixel array
+def decode_image(source):
+    with Image.open(source) as img:
+        # Keep single channel scans as they are, everything else becomes RGB
+        if img.mode not in ('L', 'RGB'):
+            single = len(img.getbands()) == 1 and img.mode != 'P'
+            img = img.convert('L' if single else 'RGB')
+        return np.asarray(img)
+
+
+# Function to open an image as grayscale, letting the JPEG decoder skip color and detail
+def open_gray(source, scale=1.0):
+    img = source if isinstance(source, Image.Image) else Image.open(source)
+    if img.format == 'JPEG':
+        # The decoder can emit luma only, scaled by 1/2, 1/4 or 1/8 but never below this size
+        width, height = img.size
+        img.draft('L', (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))))
+
+    # Other formats are converted as soon as they are decoded
+    if img.mode != 'L':
+        img = img.convert('L')
+    return img
+
+
+# Function to decode an image file to a grayscale array at no less than the given scale
+def load_gray(source, scale=1.0):
+    with Image.open(source) as img:
+        full_width = img.width
+        gray = np.asarray(open_gray(img, scale))
+    return gray, gray.shape[1] / full_width
+
+
+# Function to convert an image to a single channel uint8 array
+def to_gray(img):
+    if isinstance(img, Image.Image):
+        if img.mode != 'L':
+            img = img.convert('L')
+        return np.asarray(img)
+
+    if img.ndim == 2:
+        return img
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+
+
+# Function to wrap a grayscale array as a PIL image sharing the same memory
+def as_pil(gray):
+    return Image.fromarray(np.ascontiguousarray(gray))
+
+
+# Function to move a file object back to the start so it can be read again
+def rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+# Function to check whether a path or file object holds a PDF
+def is_pdf(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            header = f.read(5)
+    else:
+        header = source.read(5)
+        rewind(source)
+    return header == b'%PDF-'
+
+
+# Function to check whether a source has more than one page or frame
+def is_multipage(source):
+    if is_pdf(source):
+        return True
+    with Image.open(source) as img:
+        frames = getattr(img, 'n_frames', 1)
+    rewind(source)
+    return frames > 1
+
+
+# Function to render PDF pages to grayscale arrays one at a time
+def _iter_pdf_pages(source, dpi):
+    if pdfium is None:
+        raise RuntimeError("Reading PDFs needs the pypdfium2 package")
+
+    pdf = pdfium.PdfDocument(source)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                bitmap = page.render(scale=dpi / 72, grayscale=True)
+                gray = np.array(bitmap.to_pil().convert('L'))
+            finally:
+                page.close()
+            yield gray
+    finally:
+        pdf.close()
+
+
+# Function to yield each page of a PDF, multi-page TIFF or animated GIF as a grayscale array
+def iter_pages(source, dpi=PDF_DPI):
+    # Pages are produced lazily so only one is held in memory at a time
+    if is_pdf(source):
+        yield from _iter_pdf_pages(source, dpi)
+        return
+
+    with Image.open(source) as img:
+        for index in range(getattr(img, 'n_frames', 1)):
+            img.seek(index)
+            yield np.asarray(img.convert('L'))
@@ -0,0 +1,132 @@
+import contextvars
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# The timings of the document currently being processed, if any
+_active = contextvars.ContextVar("stage_timings", default=None)
+
+# tracemalloc keeps one peak for the whole process, so only one document at a time may reset and read it
+_peak_lock = threading.Lock()
+
+
+# Wall time, CPU time, peak memory and call count for each pipeline stage of one document
+class StageTimings:
+    def __init__(self):
+        self.stages = {}
+        self._stack = []
+        self._depth = 0
+        self._owns_peak = False
+        # Whether peak memory was measured; documents overlapping another one's measurement get none
+        self.memory_profiled = False
+
+    @contextmanager
+    def stage(self, name):
+        # Peak memory is only measured while tracemalloc is tracing and no other document is measuring
+        tracing = self._owns_peak and tracemalloc.is_tracing()
+        frame = {"start_bytes": 0, "peak_bytes": 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Hand the enclosing stage its peak so far before resetting the counter
+            if self._stack:
+                self._stack[-1]["peak_bytes"] = max(self._stack[-1]["peak_bytes"], peak)
+            tracemalloc.reset_peak()
+            frame["start_bytes"] = frame["peak_bytes"] = current
+        self._stack.append(frame)
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            self._stack.pop()
+
+            peak = 0
+            if tracing and tracemalloc.is_tracing():
+                frame["peak_bytes"] = max(frame["peak_bytes"], tracemalloc.get_traced_memory()[1])
+                peak = frame["peak_bytes"] - frame["start_bytes"]
+                if self._stack:
+                    self._stack[-1]["peak_bytes"] = max(self._stack[-1]["peak_bytes"], frame["peak_bytes"])
+
+            entry = self.stages.setdefault(
+                name, {"calls": 0, "seconds": 0.0, "cpu_seconds": 0.0, "peak_bytes": 0})
+            entry["calls"] += 1
+            entry["seconds"] += wall
+            entry["cpu_seconds"] += cpu
+            entry["peak_bytes"] = max(entry["peak_bytes"], peak)
+
+    @contextmanager
+    def activate(self):
+        # Make these timings the target of module level stage() calls
+        token = _active.set(self)
+        acquired = self._depth == 0 and tracemalloc.is_tracing() and _peak_lock.acquire(blocking=False)
+        if acquired:
+            self._owns_peak = self.memory_profiled = True
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if acquired:
+                self._owns_peak = False
+                _peak_lock.release()
+            _active.reset(token)
+
+    def as_dict(self):
+        return {name: {"calls": entry["calls"],
+                       "seconds": round(entry["seconds"], 6),
+                       "cpu_seconds": round(entry["cpu_seconds"], 6),
+                       "peak_bytes": entry["peak_bytes"]}
+                for name, entry in self.stages.items()}
+
+    def summary(self):
+        return ", ".join(f"{name}: {entry['seconds'] * 1000:.1f} ms x{entry['calls']}"
+                         for name, entry in self.stages.items())
+
+
+# Function to get the timings of the document being processed, if any
+def active_timings():
+    return _active.get()
+
+
+# Function to time a stage against the active document's timings, if any
+@contextmanager
+def stage(name):
+    timings = _active.get()
+    if timings is None:
+        yield
+        return
+    with timings.stage(name):
+        yield
+
+
+# Function to add one document's stage timings to running totals
+def accumulate(totals, stages):
+    for name, entry in stages.items():
+        total = totals.setdefault(name, {"calls": 0, "seconds": 0.0, "cpu_seconds": 0.0, "peak_bytes": 0})
+        total["calls"] += entry["calls"]
+        total["seconds"] += entry["seconds"]
+        total["cpu_seconds"] += entry["cpu_seconds"]
+        total["peak_bytes"] = max(total["peak_bytes"], entry["peak_bytes"])
+    return totals
+
+
+# Function to render stage totals in the Prometheus text exposition format
+def to_prometheus(totals, prefix="ocr_stage"):
+    metrics = [
+        ("calls_total", "counter", "Number of times the stage ran", "calls"),
+        ("wall_seconds_total", "counter", "Wall clock time spent in the stage", "seconds"),
+        ("cpu_seconds_total", "counter", "Process CPU time spent in the stage", "cpu_seconds"),
+        ("peak_bytes", "gauge", "Largest traced allocation peak seen in the stage", "peak_bytes"),
+    ]
+
+    lines = []
+    for suffix, kind, help_text, key in metrics:
+        lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+        lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+        for name, entry in sorted(totals.items()):
+            lines.append(f'{prefix}_{suffix}{{stage="{name}"}} {entry[key]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,144 @@
+import time
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+from image_io import to_gray
+from segmentation import character_mask
+
+
+# Grayscale, blur and edge maps of a page, each computed at most once
+class PageFeatures:
+    def __init__(self, gray):
+        self.gray = gray
+
+    @property
+    def shape(self):
+        return self.gray.shape
+
+    @cached_property
+    def blurred(self):
+        # Apply Gaussian blur
+        return cv2.GaussianBlur(self.gray, (5, 5), 0)
+
+    @cached_property
+    def edged(self):
+        # Perform edge detection
+        return cv2.Canny(self.blurred, 50, 150)
+
+    @cached_property
+    def graphic_edge_integral(self):
+        # Edges of characters say nothing about line art; they follow the text's ink
+        ink = cv2.threshold(self.blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+        # Nor do ruled lines; removed first, they no longer join handwriting into one component
+        length = max(self.shape) // 30
+        rules = cv2.bitwise_or(
+            cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1))),
+            cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, length))))
+        text = cv2.bitwise_or(character_mask(cv2.subtract(ink, rules)), rules)
+        text = cv2.dilate(text, np.ones((5, 5), np.uint8))
+        edges = cv2.compare(cv2.bitwise_and(self.edged, cv2.bitwise_not(text)), 0, cv2.CMP_GT)
+
+        # Summed-area table of the remaining edge pixels (0/1), one row and column larger than the page
+        return cv2.integral(edges // 255, sdepth=cv2.CV_32S)
+
+    def edge_density(self, x, y, w, h):
+        # Fraction of line art edge pixels in any rectangle, in constant time; arrays of
+        # rectangles are answered all at once
+        s = self.graphic_edge_integral
+        total = s[y + h, x + w] - s[y, x + w] - s[y + h, x] + s[y, x]
+        return total / np.maximum(np.multiply(w, h), 1)
+
+
+# Function to build the shared analysis stage for a page
+def analyze_page(img):
+    if img is None:
+        return None
+    return PageFeatures(to_gray(img))
+
+
+# Function to detect tables using contours
+def detect_tables(features):
+    if features is None:
+        return []
+
+    # Find contours; findContours no longer modifies its input so no copy is needed
+    contours, _ = cv2.findContours(features.edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Filter contours based on area to identify potential tables
+    tables = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > 1000:  # Adjust this threshold based on your image
+            tables.append(contour)
+
+    return tables
+
+
+# Function to detect diagram regions (x, y, w, h) using edge density
+def detect_diagrams(features, threshold=0.1, cell=None, min_cells=2):
+    if features is None:
+        return []
+
+    # Edge density of every cell of a grid, read off the summed-area table at once
+    height, width = features.shape
+    cell = cell or max(16, max(height, width) // 32)
+    ys = np.arange(0, height, cell)
+    xs = np.arange(0, width, cell)
+    y0, x0 = ys[:, None], xs[None, :]
+    density = features.edge_density(x0, y0, np.minimum(xs + cell, width)[None, :] - x0,
+                                    np.minimum(ys + cell, height)[:, None] - y0)
+
+    # If edge density is above a threshold, consider the cell part of a diagram
+    dense = (density > threshold).astype(np.uint8)  # Adjust this threshold based on your image
+    count, _, stats, _ = cv2.connectedComponentsWithStats(dense, connectivity=8)
+
+    # Neighbouring dense cells form one region
+    diagrams = []
+    for cx, cy, cw, ch, cells in stats[1:count]:
+        if cells < min_cells:
+            continue
+        x, y = int(cx * cell), int(cy * cell)
+        diagrams.append((x, y, int(min(width, (cx + cw) * cell)) - x, int(min(height, (cy + ch) * cell)) - y))
+    return diagrams
+
+
+# Function to decide cheaply, on a small copy, whether a page has text worth recognizing
+def assess_content(gray, sample_side=600, min_contrast=40, min_ink=0.0005, min_components=8,
+                   max_edge_density=0.3):
+    start = time.perf_counter()
+    height, width = gray.shape
+    factor = min(1.0, sample_side / max(height, width))
+    if factor < 1.0:
+        gray = cv2.resize(gray, (round(width * factor), round(height * factor)), interpolation=cv2.INTER_AREA)
+
+    # Ink is anything clearly darker than the paper, so faint bleed-through does not count
+    background = float(np.median(gray))
+    ink = cv2.compare(gray, background - min_contrast, cv2.CMP_LT)
+    ink_ratio = cv2.countNonZero(ink) / gray.size
+
+    # Edge density as detect_diagrams measures it
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+    edge_density = cv2.countNonZero(edges) / gray.size
+
+    # Character sized marks, as opposed to specks, rules, frames and shading
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:count, cv2.CC_STAT_HEIGHT]
+    characters = int(np.count_nonzero((heights >= 3) & (heights <= gray.shape[0] / 10)
+                                      & (stats[1:count, cv2.CC_STAT_WIDTH] <= gray.shape[1] / 4)
+                                      & (stats[1:count, cv2.CC_STAT_AREA] >= 4)))
+
+    reason = None
+    if ink_ratio < min_ink:
+        reason = "blank"
+    elif characters < min_components:
+        reason = "no_text"
+    elif edge_density > max_edge_density:
+        reason = "non_text"
+
+    return {"has_text": reason is None, "reason": reason,
+            "ink_ratio": round(ink_ratio, 5), "edge_density": round(edge_density, 5),
+            "components": count - 1, "text_components": characters,
+            "seconds": round(time.perf_counter() - start, 5)}
@@ -1,152 +1,206 @@
-import streamlit as st
-from PIL import Image, ImageEnhance, ImageFilter
-import pytesseract
-import cv2
-import numpy as np
-
-# Function to detect tables using contours
-def detect_tables(img):
-    if img is None:
-        return []
-
-    # Convert image to grayscale
-    if len(img.shape) > 2 and img.shape[2] == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    else:
-        gray = img
-
-    # Apply Gaussian blur
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-    # Perform edge detection
-    edged = cv2.Canny(blurred, 50, 150)
-
-    # Find contours
-    contours, _ = cv2.findContours(edged.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+import os
+import tracemalloc
 
-    # Filter contours based on area to identify potential tables
-    tables = []
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area > 1000:  # Adjust this threshold based on your image
-            tables.append(contour)
-
-    return tables
+import streamlit as st
 
-# Function to detect diagrams using edge density
-def detect_diagrams(img):
-    if img is None:
-        return False
+from exports import json_bytes, text_bytes
+from image_io import decode_image, is_multipage
+from instrumentation import StageTimings
+from layout import analyze_page, detect_diagrams
+from ocr_cache import preprocess_cache
+from ocr_client import get_client
+from ocr_pipeline import binarize_page, ocr_page, ocr_pages
+from tables import extract_tables, table_csv, tables_json
+from thresholding import THRESHOLD_MODES
+
+# Per-stage peak memory needs tracemalloc, which slows every allocation in the process;
+# it is traced for the whole server or not at all, e.g. OCR_PROFILE_MEMORY=1 streamlit run main.py
+PROFILE_MEMORY = os.environ.get("OCR_PROFILE_MEMORY", "") not in ("", "0")
+
+SKIP_REASONS = {
+    "blank": "the page is blank",
+    "no_text": "no character sized marks were found",
+    "non_text": "the page looks like a picture rather than text",
+}
+
+def detect_handwritten_text(pixels, mode='fixed', tiled=False, upload=None, adaptive=False):
+    try:
+        # With an OCR service configured this app is only a client of it
+        client = get_client()
+        if client is not None and upload is not None:
+            result = client.recognize(upload.getvalue(), mode=mode, tiled=tiled, adaptive=adaptive)[0]
+        else:
+            # Recognize through the result store so pages seen before return instantly
+            result = ocr_page(pixels, mode=mode, tiled=tiled, adaptive=adaptive, keep_image=True)
+
+        # Show the page tesseract saw; stored and remote results come without it
+        if result.get("image") is not None:
+            st.image(result["image"], caption="Preprocessed Image", use_column_width=True)
+        if result.get("skipped"):
+            st.caption(f"Recognition skipped: {SKIP_REASONS.get(result['skipped'], result['skipped'])}")
+        if result.get("near_duplicate"):
+            st.caption(f"Result reused from a near-duplicate page "
+                       f"({result['near_duplicate']['distance']} of 64 hash bits differ)")
+        elif result.get("cached"):
+            st.caption("Result reused from the OCR result store")
+        if result.get("scale", 1.0) != 1.0:
+            st.caption(f"Page scaled by {result['scale']} for OCR")
+        if result.get("refined"):
+            st.caption(f"{result['refined']} low confidence lines re-recognized")
+        if result.get("region_timings"):
+            st.caption(f"Region recognition: {format_region_timings(result['region_timings'])}")
+
+        return result
 
-    # Convert image to grayscale
-    if len(img.shape) > 2 and img.shape[2] == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    else:
-        gray = img
+    except Exception as e:
+        st.error(f"Error: {e}")
 
-    # Apply Gaussian blur
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+def format_region_timings(timings):
+    # Regions and recognition time per kind, e.g. "line: 12 in 840.0 ms"
+    return ", ".join(f"{kind}: {entry['regions']} in {entry['seconds'] * 1000:.1f} ms"
+                     for kind, entry in timings.items())
+
+def show_stage_timings(stages, label="Debug: pipeline stages", memory=False):
+    # Wall time, CPU time and, when it was measured, the peak memory each stage allocated
+    rows = []
+    for name, entry in stages.items():
+        row = {"stage": name,
+               "calls": entry["calls"],
+               "wall ms": round(entry["seconds"] * 1000, 1),
+               "cpu ms": round(entry["cpu_seconds"] * 1000, 1)}
+        if memory:
+            row["peak MB"] = round(entry["peak_bytes"] / (1024 * 1024), 2)
+        rows.append(row)
+    with st.expander(label):
+        st.table(rows)
+
+def detect_document_text(document, mode='fixed', tiled=False, debug=False, adaptive=False):
+    try:
+        # Pages arrive one at a time, so each is shown as soon as it is recognized;
+        # the OCR service returns them all at once
+        client = get_client()
+        if client is not None:
+            pages = client.recognize(document.getvalue(), mode=mode, tiled=tiled, adaptive=adaptive)
+        else:
+            pages = ocr_pages(document, mode=mode, tiled=tiled, adaptive=adaptive)
+        results = []
+        for result in pages:
+            results.append(result)
+            st.subheader(f"Page {result['page']}:")
+            st.text_area(f"Text (page {result['page']})", result["text"], height=200)
+            if debug:
+                show_stage_timings(result["stages"], f"Debug: page {result['page']} stages",
+                                   memory=result.get("memory_profiled", False))
+
+        st.download_button("Download Text", text_bytes("\n\n".join(result["text"] for result in results)),
+                           file_name="detected_text.txt", mime="text/plain")
+        st.download_button("Download JSON", json_bytes(results),
+                           file_name="detected_text.json", mime="application/json")
 
-    # Perform edge detection
-    edged = cv2.Canny(blurred, 50, 150)
+    except Exception as e:
+        st.error(f"Error: {e}")
 
-    # Calculate edge density
-    height, width = edged.shape
-    total_edges = cv2.countNonZero(edged)
-    edge_density = total_edges / (height * width)
+def show_tables(result, features, threshold_mode, timings):
+    # Read tables from the page OCR recognized, or binarize it the same way for stored results
+    try:
+        with timings.stage("tables"):
+            binary = result.get("image") if result else None
+            if binary is None:
+                binary = binarize_page(features.gray, threshold_mode)
+            detected_tables = extract_tables(binary)
+        if detected_tables:
+            st.subheader("Detected Tables:")
+            for number, table in enumerate(detected_tables, start=1):
+                st.table(table["rows"])
+                st.caption(f"Cell recognition: {format_region_timings(table['region_timings'])}")
+                st.download_button(f"Download Table {number} (CSV)", table_csv(table),
+                                   file_name=f"table_{number}.csv", mime="text/csv")
+            st.download_button("Download Tables (JSON)", tables_json(detected_tables),
+                               file_name="tables.json", mime="application/json")
+    except Exception as e:
+        st.error(f"Error detecting tables: {e}")
 
-    # If edge density is above a threshold, consider it as a diagram
-    if edge_density > 0.1:  # Adjust this threshold based on your image
-        return True
+def process_image(uploaded_image, threshold_mode, tiled, timings, adaptive=False):
+    # Decode the upload once; every stage below works on this pixel buffer
+    try:
+        with timings.stage("decode"):
+            pixels = decode_image(uploaded_image)
+    except Exception as e:
+        st.error(f"Error decoding image: {e}")
+        return
+
+    st.subheader("Original Image:")
+    st.image(pixels, caption="Original Image", use_column_width=True)
+
+    # Compute the gray, blur and edge maps once; OCR reuses the gray map
+    with timings.stage("analyze"):
+        features = analyze_page(pixels)
+
+    with timings.stage("ocr"):
+        result = detect_handwritten_text(features.gray, threshold_mode, tiled, uploaded_image, adaptive)
+    if result and result["text"]:
+        st.subheader("Detected Handwritten Text:")
+        st.text_area("Text", result["text"], height=200)
+
+        # Serve the text, and the words with their boxes and confidences, straight from memory
+        st.download_button("Download Text", text_bytes(result["text"]),
+                           file_name="detected_text.txt", mime="text/plain")
+        st.download_button("Download JSON", json_bytes({key: value for key, value in result.items() if key != "image"}),
+                           file_name="detected_text.json", mime="application/json")
+
+    stats = preprocess_cache.stats()
+    st.caption(f"Preprocessing cache: {stats['hits']} hits, {stats['misses']} misses")
+
+    # Detect tables and read their cells from the preprocessed page OCR already used;
+    # with an OCR service configured, this app does no recognition of its own
+    if get_client() is not None:
+        st.caption("Table extraction is not available through the OCR service")
     else:
-        return False
-
-@st.cache_data
-def enhance_image(img):
-    # Increase contrast
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(1.5)
+        show_tables(result, features, threshold_mode, timings)
 
-    # Increase sharpness
-    enhancer = ImageEnhance.Sharpness(img)
-    img = enhancer.enhance(2.0)
-
-    return img
-
-@st.cache_data
-def preprocess_image(_img):
-    if _img is None:
-        return None
-
-    # Convert image to grayscale
-    img = _img.convert('L')
-
-    # Enhance image quality
-    img = enhance_image(img)
-
-    # Apply thresholding to binarize the image
-    img = img.point(lambda x: 0 if x < 140 else 255)
-
-    return img
-
-def detect_handwritten_text(image):
+    # Detect diagrams
     try:
-        # Open the image
-        img = Image.open(image)
+        with timings.stage("diagrams"):
+            diagrams = detect_diagrams(features)
+        if diagrams:
+            st.subheader("Detected Diagrams:")
+            for x, y, w, h in diagrams:
+                st.write(f"Diagram Detected at ({x}, {y}), {w}x{h} px")
+    except Exception as e:
+        st.error(f"Error detecting diagrams: {e}")
 
-        # Preprocess the entire image
-        img = preprocess_image(img)
+def main():
+    st.title("Handwritten Text, Table, and Diagram Detection App")
 
-        if img is None:
-            return None
+    # Upload the image file
+    uploaded_image = st.file_uploader("Upload Image", type=["jpg", "jpeg", "png", "bmp", "gif", "tif", "tiff", "pdf"])
 
-        # Display the uploaded image
-        st.image(img, caption="Preprocessed Image", use_column_width=True)
+    # Sauvola copes with uneven lighting in phone photos, Otsu with dim scans
+    threshold_mode = st.selectbox("Threshold Mode", THRESHOLD_MODES, index=0)
 
-        # Use pytesseract to perform OCR
-        text = pytesseract.image_to_string(img)
+    # Splitting the page into text blocks lets one document use several cores
+    tiled = st.checkbox("Recognize text blocks in parallel", value=False)
 
-        return text
+    # A fast first pass, then heavier preprocessing for just the lines it was unsure of
+    adaptive = st.checkbox("Re-recognize low confidence lines", value=False)
 
-    except Exception as e:
-        st.error(f"Error: {e}")
+    debug = st.sidebar.checkbox("Show debug panel", value=False)
 
-def main():
-    st.title("Handwritten Text, Table, and Diagram Detection App")
+    if uploaded_image:
+        # PDFs, multi-page TIFFs and animated GIFs are streamed page by page
+        if is_multipage(uploaded_image):
+            detect_document_text(uploaded_image, threshold_mode, tiled, debug, adaptive)
+            return
 
-    # Upload the image file
-    uploaded_image = st.file_uploader("Upload Image", type=["jpg", "jpeg", "png", "bmp", "gif"])
+        with StageTimings().activate() as timings:
+            process_image(uploaded_image, threshold_mode, tiled, timings, adaptive)
 
-    if uploaded_image:
-        st.subheader("Original Image:")
-        st.image(uploaded_image, caption="Original Image", use_column_width=True)
-
-        text = detect_handwritten_text(uploaded_image)
-        if text:
-            st.subheader("Detected Handwritten Text:")
-            st.text_area("Text", text, height=200)
-
-        # Convert uploaded image to NumPy array
-        np_img = np.array(uploaded_image)
-
-        # Detect tables
-        try:
-            detected_tables = detect_tables(np_img)
-            if detected_tables:
-                st.subheader("Detected Tables:")
-                # Display detected tables (if any)
-                for table in detected_tables:
-                    st.write("Table Detected")
-        except Exception as e:
-            st.error(f"Error detecting tables: {e}")
-
-        # Detect diagrams
-        try:
-            if detect_diagrams(np_img):
-                st.subheader("Detected Diagrams:")
-                st.write("Diagram Detected")
-        except Exception as e:
-            st.error(f"Error detecting diagrams: {e}")
+        st.caption(f"Stage timings: {timings.summary()}")
+        if debug:
+            show_stage_timings(timings.as_dict(), memory=timings.memory_profiled)
 
 if __name__ == "__main__":
+    # Streamlit reruns this script on every interaction; tracing starts once and stays on
+    if PROFILE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
     main()
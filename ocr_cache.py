@@ -0,0 +1,94 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+# Function to compute a digest of the decoded pixels of an image
+def image_digest(img):
+    h = hashlib.blake2b(digest_size=16)
+
+    if isinstance(img, Image.Image):
+        # Hash the mode and size too so equal bytes in different layouts differ
+        h.update(f"{img.mode}:{img.size}".encode())
+        h.update(img.tobytes())
+    else:
+        arr = np.ascontiguousarray(img)
+        h.update(f"{arr.dtype}:{arr.shape}".encode())
+        h.update(memoryview(arr))
+
+    return h.hexdigest()
+
+
+# Function to estimate how many bytes a cached image occupies
+def _entry_size(value):
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    return getattr(value, "nbytes", 0)
+
+
+# Bounded LRU cache for preprocessed images, keyed on pixel digest and parameters
+class PreprocessCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, img, *params, digest=None):
+        return (digest or image_digest(img),) + tuple(params)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = _entry_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            # Evict least recently used entries until we are under budget
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared cache instance; lives as long as the process, across Streamlit reruns
+preprocess_cache = PreprocessCache()
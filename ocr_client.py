@@ -0,0 +1,53 @@
+import json
+import os
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+# Base URL of a running ocr_service; empty means OCR runs in this process
+DEFAULT_SERVICE_URL = os.environ.get("OCR_SERVICE_URL", "")
+
+
+# Raised when the OCR service refuses or fails a request
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"OCR service returned {status}: {message}")
+        self.status = status
+
+
+# Thin HTTP client for ocr_service
+class OcrClient:
+    def __init__(self, url=DEFAULT_SERVICE_URL, timeout=300):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, data=None):
+        request = urllib.request.Request(self.url + path, data=data, method="POST" if data is not None else "GET",
+                                         headers={"Content-Type": "application/octet-stream"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise ServiceError(e.code, message) from None
+
+    def _query(self, lang, mode, tiled, adaptive):
+        return urlencode({"lang": lang, "mode": mode, "tiled": int(tiled), "adaptive": int(adaptive)})
+
+    def recognize(self, data, lang="eng", mode="fixed", tiled=False, adaptive=False):
+        # Blocks until every page is recognized; returns one result per page
+        return self._request(f"/ocr?{self._query(lang, mode, tiled, adaptive)}", data)["pages"]
+
+    def submit(self, data, lang="eng", mode="fixed", tiled=False, adaptive=False):
+        return self._request(f"/jobs?{self._query(lang, mode, tiled, adaptive)}", data)["id"]
+
+    def poll(self, job_id):
+        return self._request(f"/jobs/{job_id}")
+
+
+# Function to get a client for the configured service, or None to OCR locally
+def get_client():
+    return OcrClient() if DEFAULT_SERVICE_URL else None
@@ -0,0 +1,183 @@
+import os
+import queue
+import shlex
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from ocr_words import OcrWords
+
+# tesserocr binds libtesseract directly; without it we fall back to pytesseract
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+DEFAULT_POOL_SIZE = int(os.environ.get("OCR_ENGINE_POOL_SIZE", min(4, os.cpu_count() or 1)))
+
+
+# Function to turn an image into a raw buffer tesseract can read without a temp file
+def _pixel_buffer(img):
+    if isinstance(img, Image.Image):
+        if img.mode not in ("L", "RGB", "RGBA"):
+            img = img.convert("L")
+        width, height = img.size
+        bpp = len(img.getbands())
+        return img.tobytes(), width, height, bpp
+
+    arr = np.ascontiguousarray(img, dtype=np.uint8)
+    height, width = arr.shape[:2]
+    bpp = 1 if arr.ndim == 2 else arr.shape[2]
+    return arr.tobytes(), width, height, bpp
+
+
+# Function to split a pytesseract style config string into psm and variables
+def _parse_config(config):
+    psm = None
+    variables = {}
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        if args[i] == "--psm" and i + 1 < len(args):
+            psm = int(args[i + 1])
+            i += 1
+        elif args[i] == "-c" and i + 1 < len(args):
+            name, _, value = args[i + 1].partition("=")
+            variables[name] = value
+            i += 1
+        i += 1
+    return psm, variables
+
+
+# Pool of initialized tesseract engines, one queue per language
+class EnginePool:
+    def __init__(self, size=DEFAULT_POOL_SIZE, tessdata_path=None):
+        self.size = max(1, size)
+        self.tessdata_path = tessdata_path
+        self._pools = {}
+        self._created = {}
+        self._lock = threading.Lock()
+
+    @property
+    def native(self):
+        return tesserocr is not None
+
+    def _create(self, lang):
+        if self.tessdata_path:
+            return tesserocr.PyTessBaseAPI(path=self.tessdata_path, lang=lang)
+        return tesserocr.PyTessBaseAPI(lang=lang)
+
+    @contextmanager
+    def engine(self, lang):
+        with self._lock:
+            pool = self._pools.setdefault(lang, queue.LifoQueue())
+            create = pool.empty() and self._created.get(lang, 0) < self.size
+            if create:
+                self._created[lang] = self._created.get(lang, 0) + 1
+
+        if create:
+            try:
+                api = self._create(lang)
+            except Exception:
+                with self._lock:
+                    self._created[lang] -= 1
+                raise
+        else:
+            # Every engine for this language is busy, wait for one to come back
+            api = pool.get()
+
+        try:
+            yield api
+        finally:
+            api.Clear()
+            pool.put(api)
+
+    @contextmanager
+    def configured(self, lang, config=""):
+        psm, variables = _parse_config(config)
+
+        with self.engine(lang) as api:
+            # Remember the engine's settings so the next caller gets a clean engine
+            saved_psm = api.GetPageSegMode()
+            saved = {name: api.GetVariableAsString(name) for name in variables}
+            try:
+                if psm is not None:
+                    api.SetPageSegMode(psm)
+                for name, value in variables.items():
+                    api.SetVariable(name, value)
+                yield api
+            finally:
+                api.SetPageSegMode(saved_psm)
+                for name, value in saved.items():
+                    api.SetVariable(name, value or "")
+
+    def image_to_string(self, img, lang="eng", config=""):
+        if not self.native:
+            return pytesseract.image_to_string(img, lang=lang, config=config)
+
+        data, width, height, bpp = _pixel_buffer(img)
+        with self.configured(lang, config) as api:
+            api.SetImageBytes(data, width, height, bpp, width * bpp)
+            return api.GetUTF8Text()
+
+    def image_to_data(self, img, lang="eng", config=""):
+        # One recognition pass yields every word with its box, confidence and place in the layout
+        if not self.native:
+            data = pytesseract.image_to_data(img, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+            return OcrWords.from_records(
+                (data["block_num"][i], data["par_num"][i], data["line_num"][i],
+                 data["left"][i], data["top"][i], data["width"][i], data["height"][i],
+                 float(data["conf"][i]), data["text"][i].strip())
+                for i in range(len(data["text"]))
+                if data["level"][i] == 5 and data["text"][i].strip())
+
+        data, width, height, bpp = _pixel_buffer(img)
+        level = tesserocr.RIL.WORD
+        records = []
+        with self.configured(lang, config) as api:
+            api.SetImageBytes(data, width, height, bpp, width * bpp)
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is None:
+                return OcrWords.from_records(records)
+
+            block = par = line = 0
+            for word in tesserocr.iterate_level(iterator, level):
+                if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                    block += 1
+                if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                    par += 1
+                if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line += 1
+
+                text = (word.GetUTF8Text(level) or "").strip()
+                box = word.BoundingBox(level)
+                if not text or box is None:
+                    continue
+                x0, y0, x1, y1 = box
+                records.append((block, par, line, x0, y0, x1 - x0, y1 - y0, word.Confidence(level), text))
+        return OcrWords.from_records(records)
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                while not pool.empty():
+                    pool.get_nowait().End()
+            self._pools.clear()
+            self._created.clear()
+
+
+_engine_pool = None
+_engine_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide engine pool, created on first use
+def get_engine_pool(size=None):
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            _engine_pool = EnginePool(size or DEFAULT_POOL_SIZE)
+        return _engine_pool
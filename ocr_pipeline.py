@@ -0,0 +1,372 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from image_io import as_pil, is_multipage, iter_pages, to_gray
+from instrumentation import StageTimings, active_timings, stage
+from layout import PageFeatures, assess_content, detect_diagrams
+from ocr_cache import image_digest, preprocess_cache
+from ocr_engine import get_engine_pool
+from ocr_words import OcrWords
+from perceptual_hash import page_hashes
+from result_store import get_result_store
+from scaling import load_scaled_gray, normalize_scale
+from script_detect import detect_script
+from segmentation import classify_block, estimate_text_height, find_text_blocks, find_text_lines
+from thresholding import binarize
+
+# Bump whenever a change to preprocessing or recognition changes the output,
+# so results stored by older versions are not returned
+PIPELINE_VERSION = "fused-5"
+
+# Lines whose mean word confidence falls below this are re-recognized in adaptive mode
+REFINE_CONFIDENCE = 60
+
+# Tesseract settings for each kind of region: a fixed layout spares it page
+# segmentation, and a whitelist spares numeric fields the full character set
+REGION_CONFIGS = {
+    "paragraph": "--psm 6",
+    "line": "--psm 7",
+    "table_cell": "--psm 7",
+    "numeric": "--psm 7 -c tessedit_char_whitelist=0123456789.,/-",
+}
+
+# PIL's ImageFilter.SMOOTH kernel, the blur ImageEnhance.Sharpness blends against
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+# Function to enhance image quality
+def enhance_image(img, contrast=1.5, sharpness=2.0):
+    # Increase contrast
+    enhancer = ImageEnhance.Contrast(img)
+    img = enhancer.enhance(contrast)
+
+    # Increase sharpness
+    enhancer = ImageEnhance.Sharpness(img)
+    img = enhancer.enhance(sharpness)
+
+    return img
+
+# Function to enhance and binarize a grayscale array in one vectorized pass
+def fused_preprocess(gray, contrast=1.5, sharpness=2.0, threshold=140, mode='fixed', out=None):
+    # Contrast stretch around the mean, as ImageEnhance.Contrast does, via a lookup table
+    mean = int(cv2.mean(gray)[0] + 0.5)
+    lut = np.clip(mean + contrast * (np.arange(256) - mean), 0, 255).astype(np.uint8)
+    stretched = cv2.LUT(gray, lut)
+
+    # Sharpen by blending against the smoothed image, folded into a single kernel
+    kernel = (1 - sharpness) * SMOOTH_KERNEL
+    kernel[1, 1] += sharpness
+    edges = (np.s_[0, :], np.s_[-1, :], np.s_[:, 0], np.s_[:, -1])
+    has_border = gray.shape[0] > 1 and gray.shape[1] > 1
+
+    if mode == 'fixed':
+        sharpened = cv2.filter2D(stretched, cv2.CV_32F, kernel, borderType=cv2.BORDER_REPLICATE)
+
+        # Binarize straight into the output buffer
+        out = cv2.compare(sharpened, threshold, cv2.CMP_GE, dst=out)
+
+        # PIL leaves the one pixel border unsharpened
+        if has_border:
+            for edge in edges:
+                out[edge] = np.where(stretched[edge] >= threshold, 255, 0)
+        return out
+
+    # Adaptive modes pick their thresholds from the sharpened page itself
+    sharpened = cv2.filter2D(stretched, cv2.CV_8U, kernel, borderType=cv2.BORDER_REPLICATE)
+    if has_border:
+        for edge in edges:
+            sharpened[edge] = stretched[edge]
+    return binarize(sharpened, mode, threshold, out=out)
+
+# Function to convert, enhance and binarize an image for OCR
+def preprocess_image(image, contrast=1.5, sharpness=2.0, threshold=140, mode='fixed', digest=None):
+    if image is None:
+        return None
+
+    # Reuse the cached result for identical pixels and parameters
+    key = preprocess_cache.make_key(image, contrast, sharpness, threshold, mode, digest=digest)
+    img = preprocess_cache.get(key)
+    if img is not None:
+        return img
+
+    # Enhance and binarize the grayscale pixels in one pass
+    binary = fused_preprocess(to_gray(image), contrast, sharpness, threshold, mode)
+    img = as_pil(binary)
+
+    preprocess_cache.put(key, img)
+    return img
+
+# Function to binarize a page the way recognition does, at the scale OCR works at
+def binarize_page(gray, mode='fixed'):
+    return preprocess_image(normalize_scale(gray)[0], mode=mode)
+
+# Function to OCR regions of a page concurrently, keeping them in the given order
+def ocr_regions(binary, boxes, recognize, workers=None):
+    def run(box):
+        x, y, w, h = box
+        return recognize(box, binary[y:y + h, x:x + w])
+
+    # Regions are independent; map returns them in the order the boxes came in
+    with ThreadPoolExecutor(max_workers=workers or get_engine_pool().size) as executor:
+        return list(executor.map(run, boxes))
+
+# Function to OCR each text line with the model for its own script
+def ocr_lines(binary, devanagari_lang='hin', workers=None):
+    def recognize(box, line):
+        lang = detect_script(line, devanagari_lang, max_height_ratio=1.0)['lang']
+
+        # Each crop is a single line of text
+        words = get_engine_pool().image_to_data(line, lang=lang, config='--psm 7').shifted(box[0], box[1])
+        return {"box": box, "lang": lang, "text": words.text, "words": words}
+
+    return ocr_regions(binary, find_text_lines(binary), recognize, workers)
+
+# Function to OCR the text blocks of a page in parallel, each with the settings for its kind
+def ocr_blocks(binary, lang='eng', workers=None):
+    text_height = estimate_text_height(cv2.compare(binary, 128, cv2.CMP_LT))
+
+    def recognize(box, block):
+        # Single lines skip tesseract's line finding; taller blocks are uniform paragraphs
+        kind = classify_block(box, text_height)
+        start = time.perf_counter()
+        words = get_engine_pool().image_to_data(block, lang=lang, config=REGION_CONFIGS[kind])
+        seconds = round(time.perf_counter() - start, 4)
+        words = words.shifted(box[0], box[1])
+        return {"box": box, "kind": kind, "text": words.text, "words": words, "seconds": seconds}
+
+    return ocr_regions(binary, find_text_blocks(binary, text_height=text_height), recognize, workers)
+
+# Function to total recognition time and region count for each kind of region
+def region_timings(regions):
+    totals = {}
+    for region in regions:
+        total = totals.setdefault(region["kind"], {"regions": 0, "seconds": 0.0})
+        total["regions"] += 1
+        total["seconds"] = round(total["seconds"] + region["seconds"], 4)
+    return totals
+
+# Function to record a page's words, and the text derived from them, on its result
+def attach_words(result, words):
+    # Boxes are in the pixels that were recognized; divide by result["scale"] for the original
+    result["words"] = words.to_columns()
+    # Blocks and lines as tesseract grouped the words, each with its union box and mean confidence
+    result["layout"] = {"blocks": words.blocks(), "lines": words.lines()}
+    result["text"] = words.text
+    return result
+
+# Function to move the words of each region into one page-wide set
+def merge_region_words(regions, key="block"):
+    parts = [region.pop("words") for region in regions]
+    for region, part in zip(regions, parts):
+        region["conf"] = round(float(part.rows["conf"].mean()), 2) if len(part) else 0.0
+    return OcrWords.concat(parts, key)
+
+# Function to clean up a weak line crop harder than a whole page could afford
+def heavy_preprocess(gray, upscale=2.0):
+    # Small or broken strokes survive a larger, denoised, locally thresholded crop better
+    gray = cv2.resize(gray, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+    gray = cv2.fastNlMeansDenoising(gray, h=10)
+    return binarize(gray, 'sauvola')
+
+# Function to re-recognize the low confidence lines of a page, keeping the rest
+def refine_words(gray, words, lang='eng', min_conf=REFINE_CONFIDENCE, upscale=2.0, pad=4, workers=None):
+    height, width = gray.shape
+    weak = []
+    for (start, end), line in zip(words.spans(), words.lines()):
+        if line["conf"] >= min_conf:
+            continue
+        x, y, w, h = line["box"]
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        weak.append(((start, end, line["conf"]), (x0, y0, min(width, x + w + pad) - x0, min(height, y + h + pad) - y0)))
+    if not weak:
+        return words, 0
+
+    def recognize(box, crop):
+        # Each crop is a single line; map its boxes back onto the page
+        retry = get_engine_pool().image_to_data(heavy_preprocess(crop, upscale), lang=lang, config='--psm 7')
+        return retry.scaled(upscale).shifted(box[0], box[1])
+
+    boxes = [box for _, box in weak]
+    retries = ocr_regions(gray, boxes, recognize, workers)
+
+    # Keep a retry only if tesseract is more confident in it than in the first pass
+    replacements = {}
+    for ((start, end, conf), _), retry in zip(weak, retries):
+        if len(retry) and float(retry.rows["conf"].mean()) > conf:
+            replacements[start] = (end, retry)
+    return words.replaced(replacements), len(replacements)
+
+# Function to re-recognize the weak lines of each region, whose words are in page coordinates
+def refine_regions(gray, regions, lang='eng'):
+    refined = 0
+    for region in regions:
+        region["words"], count = refine_words(gray, region["words"], region.get("lang", lang))
+        region["text"] = region["words"].text
+        refined += count
+    return refined
+
+# Function to recognize a grayscale page and describe what was done
+def recognize_page(gray, lang='eng', mode='fixed', digest=None, rescale=True, tiled=False, adaptive=False,
+                   skip_diagrams=False):
+    # Shrink large photos so the text is about the height tesseract works best at
+    scale = 1.0
+    if rescale:
+        with stage("rescale"):
+            gray, scale = normalize_scale(gray)
+        if digest and scale != 1.0:
+            digest = f"{digest}@{scale}"
+
+    # Preprocess the entire image
+    with stage("preprocess"):
+        img = preprocess_image(gray, mode=mode, digest=digest)
+    result = {"lang": lang, "scale": scale}
+
+    # Blank out line art so tesseract does not try to read it
+    if skip_diagrams:
+        with stage("diagrams"):
+            result["diagrams"] = detect_diagrams(PageFeatures(gray))
+        if result["diagrams"]:
+            # Copy first; the preprocessed image is shared through the cache
+            binary = np.array(img)
+            for x, y, w, h in result["diagrams"]:
+                binary[y:y + h, x:x + w] = 255
+            img = as_pil(binary)
+
+    # The page exactly as recognized, for display; ocr_page keeps it out of the stored result
+    result["image"] = img
+
+    # Pick the single model that matches the page's script
+    if lang == 'auto':
+        binary = np.asarray(img)
+        with stage("script_detect"):
+            result["script"] = detect_script(binary)
+        result["lang"] = result["script"]["lang"]
+
+        # Mixed pages are routed line by line instead of using the combined model
+        if result["script"]["script"] == 'mixed':
+            with stage("recognize"):
+                result["lines"] = ocr_lines(binary)
+            if adaptive:
+                with stage("refine"):
+                    result["refined"] = refine_regions(gray, result["lines"])
+            return attach_words(result, merge_region_words(result["lines"], key="line"))
+
+    # Split the page into blocks so one document can use every engine in the pool
+    if tiled:
+        with stage("recognize"):
+            result["blocks"] = ocr_blocks(np.asarray(img), result["lang"])
+        result["region_timings"] = region_timings(result["blocks"])
+        if adaptive:
+            with stage("refine"):
+                result["refined"] = refine_regions(gray, result["blocks"], result["lang"])
+        return attach_words(result, merge_region_words(result["blocks"]))
+
+    # Use the pooled tesseract engine to recognize words, boxes and confidences in one pass
+    with stage("recognize"):
+        words = get_engine_pool().image_to_data(img, lang=result["lang"])
+
+    # Only the lines tesseract was unsure of go through the heavy path again
+    if adaptive:
+        with stage("refine"):
+            words, result["refined"] = refine_words(gray, words, result["lang"])
+    return attach_words(result, words)
+
+# Function to drop the boxes of a result reused from another page, whose geometry they describe
+def without_geometry(result):
+    # The text carries over; boxes, regions and diagrams would mark up the wrong pixels
+    result = {key: value for key, value in result.items() if key not in ("blocks", "lines", "diagrams")}
+    result["words"] = OcrWords.from_records([]).to_columns()
+    result["layout"] = {"blocks": [], "lines": []}
+    return result
+
+# Function to run the full OCR pipeline on one page, reusing stored results
+def ocr_page(image, lang='eng', mode='fixed', tiled=False, adaptive=False, skip_empty=True, skip_diagrams=False,
+             near_duplicates=False, keep_image=False):
+    # Time the page's stages, within the caller's timings if it is collecting them
+    timings = active_timings() or StageTimings()
+    with timings.activate():
+        # Accept an opened image or decoded pixels, to be rescaled after the store lookup
+        with stage("load"):
+            if isinstance(image, (Image.Image, np.ndarray)):
+                gray = to_gray(image)
+                scale = None
+            else:
+                # Decode files straight to grayscale at about the scale OCR needs
+                gray, scale = load_scaled_gray(image)
+
+        # Blank backs of duplex scans and pictures without text never reach tesseract
+        if skip_empty:
+            with stage("content_check"):
+                content = assess_content(gray)
+            if not content["has_text"]:
+                result = attach_words({"lang": lang, "scale": scale or 1.0, "skipped": content["reason"],
+                                       "content": content}, OcrWords.from_records([]))
+                result["stages"] = timings.as_dict()
+                result["memory_profiled"] = timings.memory_profiled
+                return result
+
+        with stage("digest"):
+            digest = image_digest(gray)
+
+        # Return the stored result if these pixels were already recognized
+        store = get_result_store()
+        version = f"{PIPELINE_VERSION}:{mode}" + (":tiled" if tiled else "") + (":adaptive" if adaptive else "") \
+            + (":nodiagrams" if skip_diagrams else "")
+        result = None
+        if store is not None:
+            with stage("store_lookup"):
+                result = store.get(digest, lang, version)
+
+        # Re-photographed or re-scanned copies of a stored page can reuse its result too; opt-in,
+        # since forms that differ only in handwriting can hash alike and would share one transcript
+        hashes = None
+        if result is None and store is not None:
+            with stage("phash"):
+                hashes = page_hashes(gray)
+            if near_duplicates:
+                with stage("near_lookup"):
+                    match = store.get_near(*hashes, lang, version)
+                if match is not None:
+                    result, near_digest, distance = match
+                    result = without_geometry(result)
+                    result["near_duplicate"] = {"digest": near_digest, "distance": distance}
+
+        if result is not None:
+            result["cached"] = True
+        else:
+            result = recognize_page(gray, lang=lang, mode=mode, digest=digest, rescale=scale is None,
+                                    tiled=tiled, adaptive=adaptive, skip_diagrams=skip_diagrams)
+            if scale is not None:
+                result["scale"] = scale
+            image = result.pop("image")
+            if store is not None:
+                with stage("store_save"):
+                    store.put(digest, lang, version, result)
+                    store.put_hashes(digest, *hashes)
+            if keep_image:
+                result["image"] = image
+
+    # Peak memory in the stages is only real if this page got to measure it
+    result["stages"] = timings.as_dict()
+    result["memory_profiled"] = timings.memory_profiled
+    return result
+
+# Function to OCR every page of a document, yielding each result as soon as it is ready
+def ocr_pages(source, lang='eng', mode='fixed', tiled=False, adaptive=False, skip_empty=True,
+              skip_diagrams=False, near_duplicates=False):
+    # Single images keep the reduced-scale grayscale decode of ocr_page
+    if not is_multipage(source):
+        result = ocr_page(source, lang=lang, mode=mode, tiled=tiled, adaptive=adaptive, skip_empty=skip_empty,
+                          skip_diagrams=skip_diagrams, near_duplicates=near_duplicates)
+        result["page"] = 1
+        yield result
+        return
+
+    for number, gray in enumerate(iter_pages(source), start=1):
+        result = ocr_page(gray, lang=lang, mode=mode, tiled=tiled, adaptive=adaptive, skip_empty=skip_empty,
+                          skip_diagrams=skip_diagrams, near_duplicates=near_duplicates)
+        result["page"] = number
+        yield result
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import sys
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+from batch_ocr import _init_worker
+from ocr_pipeline import ocr_pages
+from thresholding import THRESHOLD_MODES
+
+DEFAULT_QUEUE_SIZE = int(os.environ.get("OCR_SERVICE_QUEUE_SIZE", 64))
+DEFAULT_MAX_BODY = int(os.environ.get("OCR_SERVICE_MAX_BODY", 50 * 1024 * 1024))
+# Uploads held by queued jobs; the job count alone would let 64 maximum-size bodies pile up
+DEFAULT_MAX_QUEUED_BYTES = int(os.environ.get("OCR_SERVICE_MAX_QUEUED_BYTES", 512 * 1024 * 1024))
+
+# Finished jobs kept for polling before the oldest are forgotten
+MAX_FINISHED_JOBS = 1000
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+# Function to parse per-language limits such as "hin=1,mar=1"
+def parse_lang_limits(spec):
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        lang, _, limit = item.partition("=")
+        limits[lang.strip()] = int(limit)
+    return limits
+
+
+# Function to OCR an uploaded image or document inside a worker process
+def ocr_upload(data, lang="eng", mode="fixed", tiled=False, adaptive=False):
+    try:
+        return list(ocr_pages(io.BytesIO(data), lang=lang, mode=mode, tiled=tiled, adaptive=adaptive))
+    except Exception as e:
+        # Some library exceptions cannot be unpickled, which would break the whole pool
+        raise RuntimeError(str(e)) from None
+
+
+# Bounded queue of OCR jobs feeding a pool of worker processes
+class OcrService:
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, lang_limits=None,
+                 max_queued_bytes=DEFAULT_MAX_QUEUED_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        # asyncio treats a size of 0 as unbounded
+        self.queue_size = max(1, queue_size)
+        self.max_queued_bytes = max_queued_bytes
+        self.lang_limits = lang_limits or {}
+        self.jobs = OrderedDict()
+        # One queue per language, so jobs of a language at its limit never hold up the others
+        self._queues = {}
+        self._queued = 0
+        self._queued_bytes = 0
+        self._seq = itertools.count()
+        self._running = {}
+        self._ready = None
+        self._pool = None
+        self._consumers = []
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    async def start(self):
+        self._ready = asyncio.Event()
+        self._pool = self._new_pool()
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._pool.shutdown(cancel_futures=True)
+
+    def _next_job(self):
+        # Oldest queued job among the languages with a free slot; languages without a limit may use every worker
+        ready = [queue[0] for lang, queue in self._queues.items()
+                 if queue and self._running.get(lang, 0) < self.lang_limits.get(lang, self.workers)]
+        if not ready:
+            return None
+        job, data = min(ready, key=lambda entry: entry[0]["seq"])
+        self._queues[job["lang"]].popleft()
+        self._queued -= 1
+        self._queued_bytes -= len(data)
+        self._running[job["lang"]] = self._running.get(job["lang"], 0) + 1
+        return job, data
+
+    def submit(self, data, lang="eng", mode="fixed", tiled=False, adaptive=False):
+        # Raises asyncio.QueueFull when the service is saturated; a lone job is let in whatever its size
+        if self._queued >= self.queue_size or \
+                (self._queued and self._queued_bytes + len(data) > self.max_queued_bytes):
+            raise asyncio.QueueFull
+        job = {"id": uuid.uuid4().hex, "status": "queued", "lang": lang, "mode": mode, "tiled": tiled,
+               "adaptive": adaptive, "result": None, "error": None, "seq": next(self._seq),
+               "done": asyncio.get_running_loop().create_future()}
+        self._queues.setdefault(lang, deque()).append((job, data))
+        self._queued += 1
+        self._queued_bytes += len(data)
+        self._ready.set()
+        self.jobs[job["id"]] = job
+        self._forget_finished()
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Nothing between the check and the wait yields, so no submission or finished job is missed
+            entry = self._next_job()
+            if entry is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            job, data = entry
+            pool = self._pool
+            try:
+                job["status"] = "running"
+                job["result"] = await loop.run_in_executor(
+                    pool, ocr_upload, data, job["lang"], job["mode"], job["tiled"], job["adaptive"])
+                job["status"] = "done"
+            except BrokenProcessPool:
+                # A worker died, e.g. out of memory or in libtesseract, taking the pool's running jobs
+                # with it; the first consumer to notice replaces the pool so later jobs still run
+                job["status"], job["error"] = "failed", "OCR worker process died"
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._new_pool()
+            except Exception as e:
+                job["status"], job["error"] = "failed", str(e)
+            finally:
+                job["done"].set_result(None)
+                self._running[job["lang"]] -= 1
+                # A freed language slot may unblock a waiting job
+                self._ready.set()
+
+    def stats(self):
+        statuses = [job["status"] for job in self.jobs.values()]
+        return {"workers": self.workers, "queued": self._queued, "queue_size": self.queue_size,
+                "queued_bytes": self._queued_bytes, "max_queued_bytes": self.max_queued_bytes,
+                "running": statuses.count("running"), "lang_limits": self.lang_limits}
+
+
+# Function to describe a job for a JSON response
+def job_view(job):
+    view = {key: job[key] for key in ("id", "status", "lang", "mode", "tiled", "adaptive")}
+    if job["status"] == "done":
+        view["pages"] = job["result"]
+        view["text"] = "\n\n".join(page["text"] for page in job["result"])
+    elif job["status"] == "failed":
+        view["error"] = job["error"]
+    return view
+
+
+# Minimal HTTP/1.1 front end for the service on top of asyncio streams
+class OcrServer:
+    def __init__(self, service, max_body=DEFAULT_MAX_BODY):
+        self.service = service
+        self.max_body = max_body
+
+    async def handle(self, reader, writer):
+        try:
+            status, body, headers = await self._dispatch(reader)
+        except Exception as e:
+            status, body, headers = 500, {"error": str(e)}, {}
+
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(payload)}",
+                "Connection: close"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return 400, {"error": "malformed request"}, {}
+        method, target = request_line[0], request_line[1]
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            return 400, {"error": "malformed Content-Length"}, {}
+        if length > self.max_body:
+            return 413, {"error": f"body larger than {self.max_body} bytes"}, {}
+        data = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+
+        if path == "/health" and method == "GET":
+            return 200, self.service.stats(), {}
+        if path in ("/ocr", "/jobs") and method == "POST":
+            return await self._submit(data, query, wait=path == "/ocr")
+        if path.startswith("/jobs/") and method == "GET":
+            job = self.service.jobs.get(path[len("/jobs/"):])
+            if job is None:
+                return 404, {"error": "unknown job"}, {}
+            return 200, job_view(job), {}
+        if path in ("/health", "/ocr", "/jobs") or path.startswith("/jobs/"):
+            return 405, {"error": f"{method} not allowed"}, {}
+        return 404, {"error": "not found"}, {}
+
+    async def _submit(self, data, query, wait):
+        if not data:
+            return 400, {"error": "empty body, send the image or PDF bytes"}, {}
+        mode = query.get("mode", "fixed")
+        if mode not in THRESHOLD_MODES:
+            return 400, {"error": f"mode must be one of {', '.join(THRESHOLD_MODES)}"}, {}
+        tiled = query.get("tiled", "0").lower() in ("1", "true", "yes")
+        adaptive = query.get("adaptive", "0").lower() in ("1", "true", "yes")
+
+        # Shed load instead of queueing without bound
+        try:
+            job = self.service.submit(data, query.get("lang", "eng"), mode, tiled, adaptive)
+        except asyncio.QueueFull:
+            return 429, {"error": "queue full, retry later"}, {"Retry-After": "1"}
+
+        if not wait:
+            return 202, job_view(job), {"Location": f"/jobs/{job['id']}"}
+
+        await job["done"]
+        return (200 if job["status"] == "done" else 500), job_view(job), {}
+
+
+async def serve(host, port, service):
+    await service.start()
+    server = await asyncio.start_server(OcrServer(service).handle, host, port)
+    print(f"OCR service listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the OCR pipeline over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("-q", "--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="jobs waiting beyond this are refused with 429")
+    parser.add_argument("--max-queued-bytes", type=int, default=DEFAULT_MAX_QUEUED_BYTES,
+                        help="uploads waiting beyond this many bytes in total are refused with 429")
+    parser.add_argument("--lang-limits", default=os.environ.get("OCR_SERVICE_LANG_LIMITS", ""),
+                        help="concurrent jobs per language, e.g. hin=1,mar=1")
+    args = parser.parse_args(argv)
+
+    service = OcrService(args.workers, args.queue_size, parse_lang_limits(args.lang_limits),
+                         args.max_queued_bytes)
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import numpy as np
+
+# One row per recognized word; block, paragraph and line ids only need to change where they do
+WORD_DTYPE = np.dtype([("block", np.int32), ("par", np.int32), ("line", np.int32),
+                       ("left", np.int32), ("top", np.int32), ("width", np.int32), ("height", np.int32),
+                       ("conf", np.float32)])
+
+
+# Words of a page with their boxes and confidences, kept in flat arrays rather than a dict per word
+class OcrWords:
+    def __init__(self, rows, strings):
+        self.rows = rows
+
+        # Word strings share one buffer, sliced by offset
+        lengths = np.fromiter((len(s) for s in strings), dtype=np.int32, count=len(strings))
+        self._offsets = np.zeros(len(strings) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=self._offsets[1:])
+        self._buffer = "".join(strings)
+
+    @classmethod
+    def from_records(cls, records):
+        # records are (block, par, line, left, top, width, height, conf, text) tuples
+        records = list(records)
+        rows = np.array([record[:8] for record in records], dtype=WORD_DTYPE)
+        return cls(rows, [record[8] for record in records])
+
+    @classmethod
+    def concat(cls, parts, key="block"):
+        # Renumber blocks (or lines, for line crops) so words from different regions never share one
+        rows, strings, offset = [], [], 0
+        for part in parts:
+            part_rows = part.rows.copy()
+            part_rows[key] += offset
+            if len(part_rows):
+                offset = int(part_rows[key].max()) + 1
+            rows.append(part_rows)
+            strings.extend(part.strings)
+        return cls(np.concatenate(rows) if rows else np.zeros(0, dtype=WORD_DTYPE), strings)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def word(self, index):
+        return self._buffer[self._offsets[index]:self._offsets[index + 1]]
+
+    @property
+    def strings(self):
+        return [self.word(i) for i in range(len(self))]
+
+    def to_columns(self):
+        # Column lists serialize to far smaller JSON than a list of word objects
+        columns = {name: self.rows[name].tolist() for name in WORD_DTYPE.names}
+        columns["conf"] = [round(conf, 2) for conf in columns["conf"]]
+        columns["text"] = self.strings
+        return columns
+
+    def shifted(self, dx, dy):
+        # Move boxes from a region crop into page coordinates
+        rows = self.rows.copy()
+        rows["left"] += dx
+        rows["top"] += dy
+        return self._with_rows(rows)
+
+    def scaled(self, factor):
+        # Map boxes from a rescaled page back to the original pixels
+        rows = self.rows.copy()
+        for name in ("left", "top", "width", "height"):
+            rows[name] = np.rint(rows[name] / factor)
+        return self._with_rows(rows)
+
+    def _with_rows(self, rows):
+        # Same words with new boxes; the string buffer is shared, not rebuilt
+        words = OcrWords.__new__(OcrWords)
+        words.rows, words._offsets, words._buffer = rows, self._offsets, self._buffer
+        return words
+
+    def _starts(self, keys):
+        # Index of the first word of every run of words sharing the given ids
+        if not len(self):
+            return np.zeros(0, dtype=np.intp)
+        changed = np.zeros(len(self), dtype=bool)
+        changed[0] = True
+        for key in keys:
+            changed[1:] |= self.rows[key][1:] != self.rows[key][:-1]
+        return np.flatnonzero(changed)
+
+    def spans(self, keys=("block", "par", "line")):
+        # (start, end) word index ranges of each line, or of each group of the given ids
+        starts = self._starts(keys)
+        return list(zip(starts.tolist(), np.append(starts[1:], len(self)).tolist()))
+
+    def replaced(self, replacements):
+        # Swap the words of some spans for others, which take over the ids of the words they replace
+        rows, strings, position = [], [], 0
+        for start in sorted(replacements):
+            end, words = replacements[start]
+            rows.append(self.rows[position:start])
+            strings.extend(self.word(i) for i in range(position, start))
+
+            new_rows = words.rows.copy()
+            for key in ("block", "par", "line"):
+                new_rows[key] = self.rows[key][start]
+            rows.append(new_rows)
+            strings.extend(words.strings)
+            position = end
+
+        rows.append(self.rows[position:])
+        strings.extend(self.word(i) for i in range(position, len(self)))
+        return OcrWords(np.concatenate(rows), strings)
+
+    def _join(self, start, end, lines, paragraphs):
+        # Words joined by spaces, lines by newlines and paragraphs by a blank line
+        parts = []
+        for i in range(start, end):
+            if i != start:
+                parts.append("\n\n" if i in paragraphs else "\n" if i in lines else " ")
+            parts.append(self.word(i))
+        return "".join(parts)
+
+    def _breaks(self):
+        return (set(self._starts(("block", "par", "line")).tolist()),
+                set(self._starts(("block", "par")).tolist()))
+
+    def _groups(self, keys):
+        starts = self._starts(keys)
+        if not len(starts):
+            return []
+
+        # Union box and mean confidence of each group, without a Python loop over words
+        rows = self.rows
+        ends = np.append(starts[1:], len(self))
+        left = np.minimum.reduceat(rows["left"], starts)
+        top = np.minimum.reduceat(rows["top"], starts)
+        right = np.maximum.reduceat(rows["left"] + rows["width"], starts)
+        bottom = np.maximum.reduceat(rows["top"] + rows["height"], starts)
+        conf = np.add.reduceat(rows["conf"], starts) / (ends - starts)
+
+        lines, paragraphs = self._breaks()
+        return [{"box": (int(left[i]), int(top[i]), int(right[i] - left[i]), int(bottom[i] - top[i])),
+                 "conf": round(float(conf[i]), 2),
+                 "text": self._join(start, end, lines, paragraphs)}
+                for i, (start, end) in enumerate(zip(starts, ends))]
+
+    def lines(self):
+        return self._groups(("block", "par", "line"))
+
+    def blocks(self):
+        return self._groups(("block",))
+
+    @property
+    def text(self):
+        return self._join(0, len(self), *self._breaks())
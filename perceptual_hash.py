@@ -0,0 +1,71 @@
+import os
+
+import cv2
+import numpy as np
+
+# Pages whose 64-bit hashes differ in at most this many bits count as the same page;
+# re-encoded, re-lit or resized copies of a page stay within 2. Unrelated sample pages are 24+
+# apart, but filled-in copies of one printed form can be far closer, as the thumbnail is mostly layout
+NEAR_DUPLICATE_DISTANCE = int(os.environ.get("OCR_NEAR_DUPLICATE_DISTANCE", 6))
+
+# The 256-bit verification hash sees four times the bits, so it gets four times the slack
+FINE_DISTANCE_FACTOR = 4
+
+
+# Function to hash the lowest size x size frequencies of a page's DCT, one bit per frequency
+def _dct_bits(frequencies, size):
+    low = frequencies[:size, :size].ravel()
+    # Comparing against the median rather than the mean ignores the DC term's overall brightness
+    return np.packbits(low > np.median(low[1:]))
+
+
+# Function to compute a page's 64-bit pHash and its 256-bit verification hash
+def page_hashes(gray):
+    # One thumbnail and one DCT serve both; INTER_AREA averages whole pixel blocks,
+    # so noise, JPEG artifacts and resolution wash out
+    thumb = cv2.resize(np.asarray(gray), (64, 64), interpolation=cv2.INTER_AREA).astype(np.float32)
+    frequencies = cv2.dct(thumb)
+    coarse = int(_dct_bits(frequencies, 8).view(">u8")[0])
+    fine = _dct_bits(frequencies, 16).tobytes()
+    return coarse, fine
+
+
+# Function to count the differing bits of 64-bit hashes, all at once
+def hamming(hashes, value):
+    diff = np.asarray(hashes, dtype=np.uint64) ^ np.uint64(value)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(diff)
+    # numpy < 2.0 has no popcount; count the unpacked bits instead
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+# Function to count the differing bits of two verification hashes
+def fine_distance(a, b):
+    return int(np.unpackbits(np.frombuffer(a, np.uint8) ^ np.frombuffer(b, np.uint8)).sum())
+
+
+# In-memory index of page hashes; a scan of every hash is one XOR and popcount over a flat array
+class HashIndex:
+    def __init__(self):
+        self.keys = []
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._pending = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def extend(self, keys, hashes):
+        # New hashes are batched and joined to the array on the next lookup, not copied per insert
+        self.keys.extend(keys)
+        self._pending.extend(hashes)
+
+    def nearest(self, value, max_distance):
+        if self._pending:
+            self._hashes = np.concatenate([self._hashes, np.array(self._pending, dtype=np.uint64)])
+            self._pending = []
+
+        distances = hamming(self._hashes, value)
+        hits = np.flatnonzero(distances <= max_distance)
+        # Every hit, closest first; callers skip the ones that no longer qualify
+        hits = hits[np.argsort(distances[hits], kind="stable")]
+        return [(self.keys[i], int(distances[i])) for i in hits]
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from perceptual_hash import FINE_DISTANCE_FACTOR, NEAR_DUPLICATE_DISTANCE, HashIndex, fine_distance
+
+DEFAULT_STORE_PATH = os.environ.get("OCR_RESULT_STORE", "ocr_results.sqlite")
+DEFAULT_MAX_BYTES = int(os.environ.get("OCR_RESULT_STORE_MAX_BYTES", 512 * 1024 * 1024))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    digest TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, lang, version)
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS page_hashes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL UNIQUE,
+    phash INTEGER NOT NULL,
+    fine BLOB NOT NULL
+);
+"""
+
+
+# SQLite backed OCR results keyed by pixel digest, language and pipeline version
+class ResultStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        # Page hashes are scanned in memory; rows other processes add are picked up by id,
+        # which AUTOINCREMENT never reuses
+        self._index = HashIndex()
+        self._index_id = 0
+        self._index_lock = threading.Lock()
+
+        with self._connect() as conn:
+            # Hashes from before ids only grew are dropped; they refill as pages are recognized
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(page_hashes)")]
+            if columns and "id" not in columns:
+                conn.execute("DROP TABLE page_hashes")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # sqlite connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, digest, lang, version):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT result FROM results WHERE digest = ? AND lang = ? AND version = ?",
+            (digest, lang, version),
+        ).fetchone()
+        if row is None:
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE results SET last_used = ? WHERE digest = ? AND lang = ? AND version = ?",
+                (time.time(), digest, lang, version),
+            )
+        return json.loads(row[0])
+
+    def put(self, digest, lang, version, result):
+        data = json.dumps(result, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, lang, version, data, size, time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        # Drop the least recently used results until we are back under budget
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for rowid, size in conn.execute("SELECT rowid, size FROM results ORDER BY last_used"):
+            stale.append((rowid,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM results WHERE rowid = ?", stale)
+        conn.execute("DELETE FROM page_hashes WHERE digest NOT IN (SELECT digest FROM results)")
+
+    def put_hashes(self, digest, phash, fine):
+        conn = self._connect()
+        with conn:
+            # SQLite integers are signed 64-bit
+            conn.execute("INSERT OR IGNORE INTO page_hashes (digest, phash, fine) VALUES (?, ?, ?)",
+                         (digest, phash - (1 << 64) if phash >= 1 << 63 else phash, fine))
+
+    def _sync_index(self, conn):
+        rows = conn.execute("SELECT id, digest, phash FROM page_hashes WHERE id > ? ORDER BY id",
+                            (self._index_id,)).fetchall()
+        if rows:
+            self._index.extend([digest for _, digest, _ in rows], [phash & (1 << 64) - 1 for _, _, phash in rows])
+            self._index_id = rows[-1][0]
+
+    def get_near(self, phash, fine, lang, version, max_distance=NEAR_DUPLICATE_DISTANCE):
+        # Result of the closest stored page whose hashes both fall within range, with its digest and distance
+        conn = self._connect()
+        with self._index_lock:
+            self._sync_index(conn)
+            candidates = self._index.nearest(phash, max_distance)
+
+        for digest, distance in candidates:
+            row = conn.execute("SELECT fine FROM page_hashes WHERE digest = ?", (digest,)).fetchone()
+            if row is None or fine_distance(row[0], fine) > FINE_DISTANCE_FACTOR * max_distance:
+                continue
+            result = self.get(digest, lang, version)
+            if result is not None:
+                return result, digest, distance
+        return None
+
+    def stats(self):
+        count, total = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+# Function to get the process-wide result store, or None when it is disabled
+def get_result_store():
+    global _result_store
+    if not DEFAULT_STORE_PATH:
+        return None
+
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore(DEFAULT_STORE_PATH)
+        return _result_store
@@ -0,0 +1,67 @@
+import cv2
+from PIL import Image
+
+from image_io import load_gray, rewind
+from segmentation import estimate_text_height as estimate_ink_height
+
+# Tesseract is fastest and most accurate with characters around this many pixels tall
+TARGET_TEXT_HEIGHT = 30
+
+
+# Function to estimate the dominant character height of a page in pixels
+def estimate_text_height(gray, sample_side=1200):
+    # A downscaled Otsu binarization is plenty to size the characters
+    height, width = gray.shape
+    factor = min(1.0, sample_side / max(height, width))
+    if factor < 1.0:
+        gray = cv2.resize(gray, (round(width * factor), round(height * factor)),
+                          interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+
+    text_height = estimate_ink_height(ink, default=None)
+    return text_height / factor if text_height else None
+
+
+# Function to shrink a page so its text is about the target height
+def normalize_scale(gray, target_height=TARGET_TEXT_HEIGHT, min_scale=0.25):
+    text_height = estimate_text_height(gray)
+    if not text_height:
+        return gray, 1.0
+
+    # Only ever shrink; small text is left alone rather than upscaled
+    scale = max(min_scale, min(1.0, target_height / text_height))
+    if scale > 0.95:
+        return gray, 1.0
+    return _resize(gray, scale), round(scale, 4)
+
+
+# Function to resize a grayscale page by a factor, if it is worth doing
+def _resize(gray, factor):
+    if factor > 0.95:
+        return gray
+    height, width = gray.shape
+    size = (max(1, round(width * factor)), max(1, round(height * factor)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+# Function to decode an image file straight to grayscale at the scale OCR needs
+def load_scaled_gray(source, target_height=TARGET_TEXT_HEIGHT, min_scale=0.25, sample_side=1200):
+    # Reading the header is enough to plan the probe decode
+    with Image.open(source) as img:
+        width, height = img.size
+    rewind(source)
+
+    # Size the text on a reduced decode, which JPEGs produce almost for free
+    probe, probe_scale = load_gray(source, min(1.0, sample_side / max(width, height)))
+    text_height = estimate_text_height(probe, sample_side)
+    scale = 1.0
+    if text_height:
+        scale = max(min_scale, min(1.0, target_height * probe_scale / text_height))
+        if scale > 0.95:
+            scale = 1.0
+
+    # Usually the probe already has enough pixels; otherwise decode again at the finer scale
+    if scale > probe_scale:
+        rewind(source)
+        probe, probe_scale = load_gray(source, scale)
+    return _resize(probe, scale / probe_scale), round(scale, 4)
@@ -0,0 +1,66 @@
+import time
+
+import cv2
+import numpy as np
+
+# Share of text width carrying a headline above which a page counts as
+# Devanagari, and below which it counts as Latin; in between is mixed
+DEVANAGARI_RATIO = 0.4
+LATIN_RATIO = 0.15
+
+
+# Function to check whether a word has a shirorekha, the bar Devanagari hangs from
+def has_headline(word, min_fill=0.7):
+    height, width = word.shape
+
+    # Eroding with a bar of most of the word's width only leaves pixels
+    # where a single unbroken stroke runs along the top of the word
+    top = word[: int(height * 0.4) + 1].astype(np.uint8)
+    bar = np.ones((1, max(1, int(width * min_fill))), np.uint8)
+    return cv2.erode(top, bar, borderType=cv2.BORDER_CONSTANT, borderValue=0).any()
+
+
+# Function to guess the script of a binarized page from its word shapes
+def detect_script(binary, devanagari_lang='hin', max_side=1600, min_height=8, max_height_ratio=0.125):
+    start = time.perf_counter()
+
+    # Work on a downscaled copy; the headline survives shrinking to this size
+    height, width = binary.shape
+    scale = min(1.0, max_side / max(height, width))
+    if scale < 1.0:
+        binary = cv2.resize(binary, (round(width * scale), round(height * scale)),
+                            interpolation=cv2.INTER_AREA)
+
+    # Latin letters stay separate components, Devanagari words are joined by their headline
+    ink = cv2.compare(binary, 128, cv2.CMP_LT)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    max_height = binary.shape[0] * max_height_ratio
+
+    text_width = 0
+    headline_width = 0
+    for label in range(1, count):
+        x, y, w, h, area = stats[label]
+
+        # Keep text sized blobs: skip specks, photos, boxes and table rules;
+        # pass max_height_ratio=1 when the crop is a single line
+        if h < min_height or h > max_height or w > 25 * h or area < 0.1 * w * h:
+            continue
+        text_width += w
+
+        if w >= 1.5 * h and has_headline(labels[y:y + h, x:x + w] == label):
+            headline_width += w
+
+    ratio = headline_width / text_width if text_width else 0.0
+    if ratio >= DEVANAGARI_RATIO:
+        script, lang = 'devanagari', devanagari_lang
+    elif ratio <= LATIN_RATIO:
+        script, lang = 'latin', 'eng'
+    else:
+        script, lang = 'mixed', f'{devanagari_lang}+eng'
+
+    return {
+        "script": script,
+        "lang": lang,
+        "headline_ratio": round(float(ratio), 3),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
@@ -0,0 +1,123 @@
+import cv2
+import numpy as np
+
+
+# Function to flag the connected components (one stats row each) that are character sized
+def _character_sized(stats, page_height):
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    areas = stats[:, cv2.CC_STAT_AREA]
+
+    # Keep character sized blobs: no specks, rules, boxes or page background
+    return ((heights >= 4) & (heights <= page_height / 8)
+            & (widths <= 8 * heights) & (areas >= 0.1 * widths * heights))
+
+
+# Function to mask the ink of character sized components, i.e. the text of a page
+def character_mask(ink):
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    lookup = np.zeros(count, dtype=np.uint8)
+    lookup[1:][_character_sized(stats[1:count], ink.shape[0])] = 255
+    return lookup[labels]
+
+
+# Function to estimate the dominant character height from connected components
+def estimate_text_height(ink, default=12):
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    widths = stats[1:count, cv2.CC_STAT_WIDTH]
+    heights = stats[1:count, cv2.CC_STAT_HEIGHT]
+    keep = _character_sized(stats[1:count], ink.shape[0])
+    if not keep.any():
+        return default
+
+    # Median height weighted by width, so wide words outvote noise
+    heights, widths = heights[keep], widths[keep]
+    order = np.argsort(heights)
+    cumulative = np.cumsum(widths[order])
+    return int(heights[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+# Function to sort boxes top to bottom, left to right within a row
+def reading_order(boxes):
+    rows = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        x, y, w, h = box
+        centre = y + h / 2
+
+        # Join the row whose vertical span holds this box's centre
+        for row in rows:
+            if row["top"] <= centre <= row["bottom"]:
+                row["boxes"].append(box)
+                row["bottom"] = max(row["bottom"], y + h)
+                break
+        else:
+            rows.append({"top": y, "bottom": y + h, "boxes": [box]})
+
+    return [box for row in rows for box in sorted(row["boxes"], key=lambda b: b[0])]
+
+
+# Function to find text line boxes (x, y, w, h) on a binarized page
+def find_text_lines(binary, min_height=6, pad=2):
+    ink = cv2.compare(binary, 128, cv2.CMP_LT)
+    text_height = estimate_text_height(ink)
+
+    # Smear ink sideways so the words of a line merge, but separate lines do not
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, 2 * text_height), 1))
+    joined = cv2.dilate(ink, kernel)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(joined, connectivity=8)
+
+    height, width = binary.shape
+    boxes = []
+    for x, y, w, h, _ in stats[1:count]:
+        if h < min_height or w < text_height:
+            continue
+
+        # Pad a little so ascenders and descenders are not clipped
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(width, x + w + pad), min(height, y + h + pad)
+        boxes.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+
+    return reading_order(boxes)
+
+
+# Function to find independent text blocks (x, y, w, h) on a binarized page
+def find_text_blocks(binary, pad=4, text_height=None):
+    ink = cv2.compare(binary, 128, cv2.CMP_LT)
+    text_height = text_height or estimate_text_height(ink)
+
+    # Drop specks, rules, frames, photos and scan borders so they neither
+    # glue blocks together nor become blocks of their own
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    drop = ((stats[:, cv2.CC_STAT_HEIGHT] > 8 * text_height)
+            | (stats[:, cv2.CC_STAT_WIDTH] > 40 * text_height)
+            | (stats[:, cv2.CC_STAT_AREA] < text_height))
+    drop[0] = False
+    if drop.any():
+        ink[drop[labels]] = 0
+
+    # Merge words and neighbouring lines into blocks; a gap wider than a character
+    # (a column gutter) or taller than half a line (a paragraph break) splits them
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (text_height, text_height // 2 + 1))
+    joined = cv2.dilate(ink, kernel)
+
+    # Find contours, as detect_tables does, and keep their bounding boxes
+    contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    height, width = binary.shape
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h < 4 * text_height * text_height:
+            continue
+
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(width, x + w + pad), min(height, y + h + pad)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+    return reading_order(boxes)
+
+
+# Function to tell a single line of text from a multi-line paragraph by its height
+def classify_block(box, text_height):
+    # A padded line with ascenders and descenders stays within about twice the character height
+    return "line" if box[3] <= 2.2 * text_height else "paragraph"
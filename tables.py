@@ -0,0 +1,203 @@
+import re
+import time
+
+import cv2
+import numpy as np
+
+from exports import csv_bytes, json_bytes
+from ocr_engine import get_engine_pool
+from ocr_pipeline import REGION_CONFIGS, ocr_regions, region_timings
+from segmentation import estimate_text_height
+
+# Column headers whose cells hold numbers, read with a digit whitelist
+NUMERIC_HEADER = re.compile(r"\b(no|sr|amount|amt|rs|qty|quantity|rate|price|total|date)\b", re.IGNORECASE)
+
+
+# Function to find horizontal and vertical ruling lines on a binarized page
+def find_ruling_lines(binary, min_length=None, ink=None):
+    if ink is None:
+        ink = cv2.compare(binary, 128, cv2.CMP_LT)
+
+    # Rules are much longer than any character stroke, handwritten ones included
+    min_length = min_length or 4 * estimate_text_height(ink)
+
+    # Opening with a long thin bar keeps only strokes at least that long: rules, not text
+    horizontal = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (min_length, 1)))
+    vertical = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, min_length)))
+    return horizontal, vertical
+
+
+# Function to merge nearby positions into one, e.g. the pieces of a rule broken by a faded scan
+def _cluster(values, tolerance):
+    groups = []
+    for value in sorted(values):
+        if not groups or value - groups[-1][-1] > tolerance:
+            groups.append([value])
+        else:
+            groups[-1].append(value)
+    return [sum(group) / len(group) for group in groups]
+
+
+# Function to keep the rules of one table that span most of it, from one crossing rule to another
+def _table_rules(rules, crossing, box, reach, min_span=0.5):
+    x, y, w, h = box
+    rules, crossing = rules[y:y + h, x:x + w], crossing[y:y + h, x:x + w]
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(rules)
+
+    kept = np.zeros_like(rules)
+    positions = []
+    for label in range(1, count):
+        rx, ry, rw, rh, _ = stats[label]
+        horizontal = rw >= rh
+        # Handwritten strokes, like the dash after an amount, cross a few rows at most
+        if (rw if horizontal else rh) < min_span * (w if horizontal else h):
+            continue
+        # A rule ends on the rules it meets; a stray stroke stops short of them at one end at least
+        if horizontal:
+            cy = int(centroids[label][1])
+            ends = [crossing[max(0, cy - reach):cy + reach + 1, max(0, end - reach):end + reach + 1]
+                    for end in (rx, rx + rw - 1)]
+        else:
+            cx = int(centroids[label][0])
+            ends = [crossing[max(0, end - reach):end + reach + 1, max(0, cx - reach):cx + reach + 1]
+                    for end in (ry, ry + rh - 1)]
+        if all(cv2.countNonZero(end) for end in ends):
+            kept[labels == label] = 255
+            positions.append(y + centroids[label][1] if horizontal else x + centroids[label][0])
+    return kept, positions
+
+
+# Function to find the cells (x, y, w, h) enclosed by one table's rules
+def _table_cells(grid, box, min_side):
+    x, y, w, h = box
+    open_space = cv2.bitwise_not(grid)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(open_space, connectivity=4)
+
+    cells = []
+    for cx, cy, cw, ch, _ in stats[1:count]:
+        # Space touching the table's edge is outside it, not a cell
+        if cx == 0 or cy == 0 or cx + cw == w or cy + ch == h:
+            continue
+        if cw < min_side or ch < min_side:
+            continue
+        cells.append((int(x + cx), int(y + cy), int(cw), int(ch)))
+    return cells
+
+
+# Function to find tables and their cell grids on a binarized page
+def find_tables(binary, min_rows=2, min_cols=2):
+    ink = cv2.compare(binary, 128, cv2.CMP_LT)
+    text_height = estimate_text_height(ink)
+    horizontal, vertical = find_ruling_lines(binary, 4 * text_height, ink)
+
+    # Close small breaks where rules cross or the scan faded
+    kernel = np.ones((3, 3), np.uint8)
+    horizontal, vertical = cv2.dilate(horizontal, kernel), cv2.dilate(vertical, kernel)
+    grid = cv2.bitwise_or(horizontal, vertical)
+    reach = max(3, text_height // 2)
+
+    tables = []
+    contours, _ = cv2.findContours(grid, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in contours:
+        box = cv2.boundingRect(contour)
+
+        # Row and column boundaries are the table's rules; merged cells span several
+        kept_h, rows = _table_rules(horizontal, vertical, box, reach)
+        kept_v, cols = _table_rules(vertical, horizontal, box, reach)
+        row_bounds, col_bounds = _cluster(rows, reach), _cluster(cols, reach)
+        if len(row_bounds) - 1 < min_rows or len(col_bounds) - 1 < min_cols:
+            continue
+
+        cells = _table_cells(cv2.bitwise_or(kept_h, kept_v), box, min_side=max(6, text_height // 2))
+        grid_cells = []
+        for cx, cy, cw, ch in cells:
+            # A cell lies between the rules around it and spans every rule inside it
+            row = int(np.searchsorted(row_bounds, cy)) - 1
+            col = int(np.searchsorted(col_bounds, cx)) - 1
+            rowspan = int(np.searchsorted(row_bounds, cy + ch)) - row
+            colspan = int(np.searchsorted(col_bounds, cx + cw)) - col
+            if row < 0 or col < 0:
+                continue
+            grid_cells.append({"row": row, "col": col, "rowspan": rowspan, "colspan": colspan,
+                               "box": (cx, cy, cw, ch)})
+        if not grid_cells:
+            continue
+
+        tables.append({"box": tuple(int(v) for v in box), "n_rows": len(row_bounds) - 1,
+                       "n_cols": len(col_bounds) - 1, "text_height": text_height,
+                       "cells": sorted(grid_cells, key=lambda cell: (cell["row"], cell["col"]))})
+
+    return sorted(tables, key=lambda table: (table["box"][1], table["box"][0]))
+
+
+# Function to OCR a batch of table cells concurrently, each with the settings for its kind
+def _read_cells(binary, cells, lang, margin, workers):
+    boxes, kinds = [], {}
+    for cell in cells:
+        x, y, w, h = cell["box"]
+        # Stay clear of the rules so their remains are not read as | or _
+        box = (x + margin, y + margin, max(1, w - 2 * margin), max(1, h - 2 * margin))
+        kinds[box] = cell["kind"]
+        boxes.append(box)
+
+    def recognize(box, crop):
+        # crop is a view into the preprocessed page; empty cells never reach tesseract
+        start = time.perf_counter()
+        if min(crop.shape) < 4 or cv2.countNonZero(cv2.compare(crop, 128, cv2.CMP_LT)) < 4:
+            return "", 0.0
+        text = get_engine_pool().image_to_string(crop, lang=lang, config=REGION_CONFIGS[kinds[box]]).strip()
+        return text, round(time.perf_counter() - start, 4)
+
+    for cell, (text, seconds) in zip(cells, ocr_regions(binary, boxes, recognize, workers)):
+        cell["text"], cell["seconds"] = text, seconds
+
+
+# Function to OCR the cells of every table concurrently
+def read_tables(binary, tables, lang="eng", margin=3, workers=None):
+    # One line per cell, or a uniform block for tall cells
+    for table in tables:
+        for cell in table["cells"]:
+            tall = cell["box"][3] - 2 * margin >= 3 * table["text_height"]
+            cell["kind"] = "paragraph" if tall else "table_cell"
+
+    # Headers come first: they tell which columns hold numbers
+    headers = [cell for table in tables for cell in table["cells"] if cell["row"] == 0]
+    _read_cells(binary, headers, lang, margin, workers)
+
+    body = []
+    for table in tables:
+        numeric = {cell["col"] for cell in table["cells"]
+                   if cell["row"] == 0 and cell["colspan"] == 1 and NUMERIC_HEADER.search(cell["text"])}
+        for cell in table["cells"]:
+            if cell["row"] == 0:
+                continue
+            # Cells spanning several columns, like a TOTAL label, are not numeric fields
+            if cell["kind"] == "table_cell" and cell["colspan"] == 1 and cell["col"] in numeric:
+                cell["kind"] = "numeric"
+            body.append(cell)
+    _read_cells(binary, body, lang, margin, workers)
+
+    for table in tables:
+        table["region_timings"] = region_timings(table["cells"])
+        rows = [[""] * table["n_cols"] for _ in range(table["n_rows"])]
+        for cell in table["cells"]:
+            rows[cell["row"]][cell["col"]] = cell["text"]
+        table["rows"] = rows
+    return tables
+
+
+# Function to find and read every table of a binarized page
+def extract_tables(binary, lang="eng", workers=None):
+    binary = np.asarray(binary)
+    return read_tables(binary, find_tables(binary), lang, workers=workers)
+
+
+# Function to encode one table as CSV
+def table_csv(table):
+    return csv_bytes(table["rows"])
+
+
+# Function to encode tables, with their cell boxes and spans, as JSON
+def tables_json(tables):
+    return json_bytes([{key: table[key] for key in ("box", "n_rows", "n_cols", "cells", "rows", "region_timings")}
+                       for table in tables])
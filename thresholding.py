@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+THRESHOLD_MODES = ("fixed", "otsu", "sauvola")
+
+
+# Function to binarize with one global threshold picked by Otsu's method
+def otsu_threshold(img, out=None):
+    _, out = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=out)
+    return out
+
+
+# Function to binarize with Sauvola's local threshold
+def sauvola_threshold(img, window=25, k=0.2, dynamic_range=128, out=None):
+    # Local means of values and of squares; box filters cost the same per pixel at any window size
+    pixels = img.astype(np.float32)
+    mean = cv2.boxFilter(pixels, cv2.CV_32F, (window, window), borderType=cv2.BORDER_REPLICATE)
+    spread = cv2.sqrBoxFilter(pixels, cv2.CV_32F, (window, window), borderType=cv2.BORDER_REPLICATE)
+
+    # Work in place on these three float32 buffers, 12 bytes a pixel in all
+    np.multiply(mean, mean, out=pixels)
+    np.subtract(spread, pixels, out=spread)
+    np.maximum(spread, 0, out=spread)
+    np.sqrt(spread, out=spread)
+
+    # threshold = mean * (1 + k * (std / dynamic_range - 1))
+    spread *= k / dynamic_range
+    spread += 1 - k
+    spread *= mean
+
+    # Ink (at or below the local threshold) becomes black, background white
+    if out is None:
+        out = np.empty_like(img)
+    np.multiply(img > spread, 255, out=out, casting="unsafe")
+    return out
+
+
+# Function to binarize a grayscale image with the selected threshold mode
+def binarize(img, mode="fixed", threshold=140, window=25, k=0.2, out=None):
+    if mode == "fixed":
+        return cv2.compare(img, threshold, cv2.CMP_GE, dst=out)
+    if mode == "otsu":
+        return otsu_threshold(img, out=out)
+    if mode == "sauvola":
+        return sauvola_threshold(img, window=window, k=k, out=out)
+    raise ValueError(f"Unknown threshold mode: {mode}")